@@ -1,7 +1,23 @@
 import math
 import numpy as np
 import csv
+import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from columnar import read_table, table_format, write_table
+from instrumentation import count, enable, instrumented
+from random_streams import RUN_SEED, uniform
+
+# Santa's size in centimeters
+SANTA_SIZE = 83.82
+
+# Rows read, enriched and written per batch
+CHUNK_SIZE = 5000
+
+# Kids x samples simulated per block, and the size above which blocks go to a process pool
+SIMULATION_BLOCK_CELLS = 2_000_000
+PARALLEL_THRESHOLD_CELLS = 20_000_000
 
 # Function to calculate the probability Santa can fit through the horn
 def calculate_fit_probability(santa_size, horn_diameter):
@@ -11,67 +27,164 @@ def calculate_fit_probability(santa_size, horn_diameter):
         # Decreasing exponential model for probabilities
         return math.exp(-(santa_size - horn_diameter) / horn_diameter)
 
-# Santa's size in centimeters
-santa_size = 83.82
-
-# Read data from CSV
-kids = []
-countries = []
-data = []
-with open("santa.csv", 'r', encoding='utf-8') as file:
-    csv_reader = csv.reader(file)
-    header = next(csv_reader)
+# Vectorized calculate_fit_probability over an array of horn diameters
+def fit_probabilities(santa_size, horn_diameters):
+    horn_diameters = np.asarray(horn_diameters, dtype=np.float64)
+    return np.where(santa_size <= horn_diameters, 1.0, np.exp(-(santa_size - horn_diameters) / horn_diameters))
+
+# Horn diameters in cm, one per kid from the kid's own 'horn' stream
+def horn_diameters(child_ids, seed=RUN_SEED):
+    return uniform(seed, child_ids, 'horn', 50, 150)
+
+# Simulate one block of kids (runs in a worker process for large runs)
+def simulate_block(child_ids, samples, seed, santa_size, percentiles):
+    diameters = uniform(seed, np.asarray(child_ids)[:, np.newaxis], 'horn-simulation', 50, 150,
+                        counter=np.arange(samples, dtype=np.uint64)[np.newaxis, :])
+    probabilities = fit_probabilities(santa_size, diameters)
+    return probabilities.mean(axis=1), np.percentile(probabilities, percentiles, axis=1).T
+
+# Monte Carlo horn-fit simulation: `samples` random horns per kid
+@instrumented
+def simulate_fit_probabilities(n_kids, samples=1000, seed=RUN_SEED, santa_size=SANTA_SIZE, percentiles=(5, 50, 95),
+                               workers=None, child_ids=None):
+    """
+    Return a DataFrame with the mean and percentiles of each kid's fit probability.
+
+    Kids are simulated in blocks of about SIMULATION_BLOCK_CELLS draws, each
+    block drawing all of its horns in one array operation. Horn j of a kid is
+    draw j of its (seed, Child_ID) stream (child_ids default to 1..n_kids),
+    so a kid's results do not depend on its block or the worker count; runs
+    above PARALLEL_THRESHOLD_CELLS draws are spread over a process pool.
+    """
+    count('horns_simulated', n_kids * samples)
+    block_kids = max(1, SIMULATION_BLOCK_CELLS // max(samples, 1))
+    child_ids = np.arange(1, n_kids + 1) if child_ids is None else np.asarray(child_ids)
+    jobs = [(child_ids[start:start + block_kids], samples, seed, santa_size, list(percentiles))
+            for start in range(0, n_kids, block_kids)]
+
+    if n_kids * samples > PARALLEL_THRESHOLD_CELLS and workers != 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(simulate_block, *zip(*jobs)))
+    else:
+        results = [simulate_block(*job) for job in jobs]
+
+    columns = {'Mean_Fit_Probability': np.concatenate([mean for mean, _ in results])}
+    percentile_values = np.concatenate([values for _, values in results]) if results else np.empty((0, len(percentiles)))
+    for i, p in enumerate(percentiles):
+        columns[f'P{p:g}_Fit_Probability'] = percentile_values[:, i]
+    return pd.DataFrame(columns)
+
+# Per-country aggregates of a simulation
+def country_fit_summary(countries, simulation):
+    summary = simulation.assign(Country=np.asarray(countries)).groupby('Country')['Mean_Fit_Probability']
+    return summary.agg(['mean', 'min', 'max', 'count']).sort_values('mean')
+
+# Read a CSV in fixed-size batches of rows
+def read_chunks(csv_reader, chunk_size):
+    chunk = []
     for row in csv_reader:
-        kids.append(row[1])  # Kid's name
-        countries.append(row[6])  # Country
-        data.append(row)  # Store all data
-
-# Generate 5000 random horn sizes
-np.random.seed(42)  # For reproducibility
-horn_sizes = np.random.uniform(50, 150, 5000)
-
-# Add fit probabilities and messages to data
-fit_probabilities = []
-for idx, row in enumerate(data):
-    if idx < len(horn_sizes):
-        horn_diameter = horn_sizes[idx]
-        probability = calculate_fit_probability(santa_size, horn_diameter)
-        message = ""
-        if probability < 0.6:
-            message = f"Rudolph is suggesting Santa skip the cookies at {row[1]}'s house"
-        else:
-            message = "You can enter safely."
-        row.append(f"{probability:.2f}")  # Add fit probability
-        row.append(message)  # Add the horn message
-        fit_probabilities.append([idx, horn_diameter, probability])
-
-# Calculate probabilities per country
-country_probabilities = defaultdict(list)
-for idx, horn_diameter in enumerate(horn_sizes):
-    if idx < len(kids):
-        probability = calculate_fit_probability(santa_size, horn_diameter)
-        country_probabilities[countries[idx]].append(probability)
-
-# Calculate average probability for each country and find warning countries
-warning_countries = []
-country_average_probabilities = {}
-for country, probabilities in country_probabilities.items():
-    avg_probability = sum(probabilities) / len(probabilities)
-    country_average_probabilities[country] = avg_probability
-    if avg_probability < 0.65:
-        warning_countries.append(country)
-
-# Save updated data to a new CSV file
-updated_header = header + ["Fit Probability", "Horn Message"]
-output_file = "updated_santa.csv"
-with open(output_file, "w", encoding="utf-8", newline="") as file:
-    csv_writer = csv.writer(file)
-    csv_writer.writerow(updated_header)
-    csv_writer.writerows(data)
-
-# Print warning messages and phrases
-
-
-
-
-print(f"Updated CSV file saved as: {output_file}")
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Stream santa.csv through the horn model and write updated_santa.csv as it goes
+@instrumented
+def enrich_horn_probabilities(input_file="santa.csv", output_file="updated_santa.csv", chunk_size=CHUNK_SIZE,
+                              seed=RUN_SEED, santa_size=SANTA_SIZE):
+    """
+    Add "Fit Probability" and "Horn Message" columns to every kid.
+
+    Rows are processed in batches of chunk_size, so memory stays flat for
+    any input size. Each kid's horn size is keyed by (seed, Child_ID), so it
+    does not depend on the chunk size or the row order. Per-country sums are
+    kept in the same pass. Returns {country: average probability}.
+
+    When either file is not a CSV (Parquet, Feather or a column store) the
+    table is enriched in one vectorized pass with the same horn sizes.
+    """
+    if table_format(input_file) != 'csv' or table_format(output_file) != 'csv':
+        return enrich_table(input_file, output_file, seed, santa_size)
+
+    country_totals = defaultdict(lambda: [0.0, 0])
+
+    with open(input_file, 'r', encoding='utf-8') as source, \
+            open(output_file, "w", encoding="utf-8", newline="") as target:
+        csv_reader = csv.reader(source)
+        csv_writer = csv.writer(target)
+        header = next(csv_reader)
+        csv_writer.writerow(header + ["Fit Probability", "Horn Message"])
+        id_column = header.index("Child_ID")
+
+        for chunk in read_chunks(csv_reader, chunk_size):
+            horn_sizes = horn_diameters([row[id_column] for row in chunk], seed)
+            for row, horn_diameter in zip(chunk, horn_sizes):
+                probability = calculate_fit_probability(santa_size, horn_diameter)
+                if probability < 0.6:
+                    message = f"Rudolph is suggesting Santa skip the cookies at {row[1]}'s house"
+                else:
+                    message = "You can enter safely."
+                row.append(f"{probability:.2f}")  # Add fit probability
+                row.append(message)  # Add the horn message
+                totals = country_totals[row[6]]
+                totals[0] += probability
+                totals[1] += 1
+            csv_writer.writerows(chunk)
+            count('rows_enriched', len(chunk))
+
+    return {country: total / kids for country, (total, kids) in country_totals.items()}
+
+# enrich_horn_probabilities for columnar files: typed columns in, typed columns out
+@instrumented
+def enrich_table(input_file, output_file, seed=RUN_SEED, santa_size=SANTA_SIZE):
+    kids = read_table(input_file)
+    count('rows_enriched', len(kids))
+    probabilities = fit_probabilities(santa_size, horn_diameters(kids['Child_ID'].to_numpy(), seed))
+    names = kids['Name'].astype(str).to_numpy(dtype=object)
+    messages = np.where(probabilities < 0.6,
+                        "Rudolph is suggesting Santa skip the cookies at " + names + "'s house",
+                        "You can enter safely.")
+    kids['Fit Probability'] = probabilities.round(2)
+    kids['Horn Message'] = messages
+    write_table(kids, output_file)
+    averages = pd.Series(probabilities).groupby(kids['Country'].to_numpy()).mean()
+    return averages.to_dict()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add horn fit probabilities to the kid list.")
+    parser.add_argument('--input', default="santa.csv")
+    parser.add_argument('--output', default="updated_santa.csv")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=RUN_SEED)
+    parser.add_argument('--simulate', type=int, default=0, metavar='SAMPLES',
+                        help="Instead of enriching, run a Monte Carlo simulation with SAMPLES horns per kid.")
+    parser.add_argument('--simulation-output', default="horn_simulation.csv")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--metrics', metavar='PATH', help="Write a JSON report of stage timings and counters to PATH.")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        enable(args.metrics)
+
+    if args.simulate:
+        kids = read_table(args.input, columns=['Child_ID', 'Country'])
+        simulation = simulate_fit_probabilities(len(kids), args.simulate, seed=args.seed, workers=args.workers,
+                                                child_ids=kids['Child_ID'].to_numpy())
+        write_table(pd.concat([kids, simulation], axis=1), args.simulation_output)
+        print(country_fit_summary(kids['Country'], simulation).head(10))
+        print(f"Simulation of {args.simulate} horns per kid saved as: {args.simulation_output}")
+        return
+
+    country_average_probabilities = enrich_horn_probabilities(args.input, args.output, args.chunk_size, args.seed)
+
+    # Find warning countries
+    warning_countries = [country for country, avg_probability in country_average_probabilities.items()
+                         if avg_probability < 0.65]
+
+    if warning_countries:
+        print(f"Rudolph warns about the chimneys in: {', '.join(sorted(warning_countries))}")
+    print(f"Updated CSV file saved as: {args.output}")
+
+if __name__ == "__main__":
+    main()
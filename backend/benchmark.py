@@ -0,0 +1,186 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from scoring import DeedScorer, load_afinn, score_kids
+from djikstra import BLOCK_SIZE, build_distance_matrix_vectorized, solve_tsp_greedy, solve_tsp_kdtree
+from categorizer import categorize_gifts, load_or_train_model
+from Horn_probability_finished import enrich_horn_probabilities
+from gifts import assign_gifts
+from random_streams import sample_positions
+from synthetic import DEFAULT_SIZES, KidGenerator, size_label, synthetic_path, write_synthetic
+
+# Where baselines are kept
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+# Kids routed by the distance matrix and greedy stages (the matrix grows with the square)
+MATRIX_KIDS = 2000
+
+# Distinct coordinates in the duplicate-heavy routing stage
+DUPLICATE_SITES = 10
+
+# A stage is reported as a regression when it is this much slower or bigger than the baseline
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+
+# Stage setups prepare untimed inputs from the dataset; stage runs are what gets measured
+def setup_scoring(context):
+    return pd.read_csv(context['path']), DeedScorer(load_afinn(context['afinn']))
+
+def setup_routing(context):
+    kids = context['kids']
+    sample = kids.iloc[sample_positions(kids['Child_ID'], context['matrix_kids'])]
+    return list(zip(sample['Latitude'], sample['Longitude']))
+
+# Built the way the routes stage builds it
+def run_distance_matrix(locations):
+    return build_distance_matrix_vectorized(locations, block_size=BLOCK_SIZE)
+
+def setup_greedy(context):
+    locations = setup_routing(context)
+    return build_distance_matrix_vectorized(locations), max(range(len(locations)), key=lambda i: locations[i][1])
+
+# Every kid, routed without a distance matrix
+def setup_kdtree(context):
+    return list(zip(context['kids']['Latitude'], context['kids']['Longitude'])), 0
+
+# Every kid moved onto one of a few coordinates, the worst case for lazy deletion in the KD-tree
+def setup_kdtree_duplicates(context):
+    locations = setup_kdtree(context)[0]
+    return [locations[i % DUPLICATE_SITES] for i in range(len(locations))], 0
+
+def setup_categorization(context):
+    return context['kids']['Gift_Preference'], load_or_train_model()
+
+def setup_horn(context):
+    return context['path'], os.path.join(context['workdir'], 'updated.csv')
+
+def setup_gifts(context):
+    return context['scored']['Final_Score']
+
+STAGES = [
+    ('scoring', setup_scoring, lambda args: score_kids(*args)),
+    ('distance_matrix', setup_routing, run_distance_matrix),
+    ('tsp_greedy', setup_greedy, lambda args: solve_tsp_greedy(*args)),
+    ('tsp_kdtree', setup_kdtree, lambda args: solve_tsp_kdtree(*args)),
+    ('tsp_kdtree_duplicates', setup_kdtree_duplicates, lambda args: solve_tsp_kdtree(*args)),
+    ('categorization', setup_categorization, lambda args: categorize_gifts(*args)),
+    ('horn_probability', setup_horn, lambda args: enrich_horn_probabilities(*args)),
+    ('gift_assignment', setup_gifts, assign_gifts),
+]
+
+def measure(run, setup, repeat=1):
+    """
+    Best wall time over `repeat` untraced runs, and the peak traced memory
+    of one more run under tracemalloc (which slows the code it traces down
+    several times, so it is kept out of the timings). Every run gets fresh
+    inputs from setup(), so warm caches in the inputs do not carry over.
+    """
+    times = []
+    for _ in range(repeat):
+        inputs = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(inputs)
+        times.append(time.perf_counter() - start)
+
+    inputs = setup()
+    gc.collect()
+    tracemalloc.start()
+    run(inputs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': round(min(times), 4), 'peak_mb': round(peak / 2 ** 20, 2)}
+
+def benchmark_dataset(path, afinn='AFINN-111.txt', stages=None, repeat=1, matrix_kids=MATRIX_KIDS):
+    """Measure every stage on one kid file; returns {stage: measurement}."""
+    kids = pd.read_csv(path)
+    with tempfile.TemporaryDirectory() as workdir:
+        context = {'path': path, 'afinn': afinn, 'kids': kids, 'workdir': workdir, 'matrix_kids': matrix_kids,
+                   'scored': score_kids(kids, DeedScorer(load_afinn(afinn)))}
+        results = {}
+        for name, setup, run in STAGES:
+            if stages and name not in stages:
+                continue
+            results[name] = measure(run, lambda: setup(context), repeat)
+            print(f"  {name:<22} {results[name]['seconds']:>9.3f} s {results[name]['peak_mb']:>10.1f} MB")
+    return results
+
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """Lines describing every stage that got slower or bigger than the baseline allows."""
+    regressions = []
+    for dataset, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(dataset, {}).get(stage)
+            if not previous:
+                continue
+            for key, tolerance in (('seconds', time_tolerance), ('peak_mb', memory_tolerance)):
+                # Ignore noise on stages too small to measure reliably
+                if current[key] > previous[key] * (1 + tolerance) and current[key] - previous[key] > 0.05:
+                    regressions.append(f"{dataset} {stage}: {key} {previous[key]} -> {current[key]}")
+    return regressions
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['results']
+
+def save_baseline(results, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    environment = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                   'machine': platform.machine(), 'cpus': os.cpu_count()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment, 'results': results}, f, indent=4)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile each backend stage on synthetic kid lists.")
+    parser.add_argument('--kids', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--data-dir', default='synthetic', help="Where the synthetic files are kept (generated if missing).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--stages', nargs='+', choices=[name for name, _, _ in STAGES])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--matrix-kids', type=int, default=MATRIX_KIDS)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    generator = None
+    results = {}
+    for n_kids in args.kids:
+        path = synthetic_path(n_kids, args.data_dir)
+        if not os.path.exists(path):
+            generator = generator or KidGenerator()
+            write_synthetic(path, n_kids, args.seed, generator=generator)
+        print(f"{size_label(n_kids)} kids ({path}):")
+        results[size_label(n_kids)] = benchmark_dataset(path, stages=args.stages, repeat=args.repeat,
+                                                        matrix_kids=args.matrix_kids)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"No baseline at {args.baseline} yet, run with --save-baseline to store one.")
+        return 0
+    regressions = compare(results, baseline)
+    if regressions:
+        print("Regressions against the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("No regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
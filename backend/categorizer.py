@@ -0,0 +1,229 @@
+import hashlib
+import os
+import pickle
+import re
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from columnar import read_table
+from instrumentation import count, instrumented
+
+# Bump whenever the model or tokenizer changes so saved models are rebuilt
+MODEL_VERSION = 1
+
+# Where the trained model is saved between runs
+MODEL_PATH = os.path.join('.cache', 'gift_model.pkl')
+
+# Sample training dataset
+training_data = [
+    ('Door Basketball Hoop', 'Toys and Vehicles'),
+    ('Rhythm Tambourine', 'Musical Instruments'),
+    ('School House Pack', 'Educational Kits'),
+    ('Wireless Headphones', 'Musical Instruments'),
+    ('Rocket Building Set', 'Games and Puzzles'),
+    ('Beauty Salon Set', 'Toys and Vehicles'),
+    ('Music Mixing Set', 'Musical Instruments'),
+    ('Cooking Master Kit', 'Food Cooking'),
+    ('Performance Microphone', 'Musical Instruments'),
+    ('Diamond Dig Set', 'Games and Puzzles'),
+    # Add more training samples as needed
+]
+
+# NLTK's English stopword list, used when the NLTK corpus is not installed locally
+ENGLISH_STOPWORDS = """
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves he him his
+himself she she's her hers herself it it's its itself they them their theirs themselves what which who whom this
+that that'll these those am is are was were be been being have has had having do does did doing a an the and but
+if or because as until while of at by for with about against between into through during before after above below
+to from up down in out on off over under again further then once here there when where why how all any both each
+few more most other some such no nor not only own same so than too very s t can will just don don't should
+should've now d ll m o re ve y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't
+haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't
+weren weren't won won't wouldn wouldn't
+""".split()
+
+# Define stopwords, from the local NLTK corpus when available (never downloaded)
+def load_stop_words():
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
+    except (ImportError, LookupError):
+        return frozenset(ENGLISH_STOPWORDS)
+
+# Words, keeping hyphenated words and apostrophes together like word_tokenize does
+_token_pattern = re.compile(r"[\w'-]+")
+
+def extract_tokens(text, stop_words):
+    """
+    Tokenize the text, keeping alphabetic words that are not stopwords.
+    """
+    words = (token.split("'")[0] for token in _token_pattern.findall(text.lower()))
+    return [word for word in words if word.isalpha() and word not in stop_words]
+
+def extract_features(text, stop_words):
+    """
+    Extract features from the text by tokenizing, removing stopwords,
+    and creating a bag-of-words feature dictionary.
+    """
+    return {word: True for word in extract_tokens(text, stop_words)}
+
+class NaiveBayesGiftClassifier:
+    """
+    Multinomial Naive Bayes over bag-of-words counts.
+
+    Training builds one vocabulary and a (categories x words) table of
+    smoothed log probabilities. A whole batch of gift names is encoded as a
+    sparse count matrix and scored with one matrix multiply; words outside
+    the vocabulary are ignored.
+    """
+
+    def __init__(self, stop_words, alpha=1.0):
+        self.stop_words = stop_words
+        self.alpha = alpha
+        self.vocabulary = {}
+        self.categories = []
+        self.class_log_prior = None
+        self.feature_log_prob = None
+
+    def encode(self, texts):
+        """Sparse (len(texts) x vocabulary) word count matrix."""
+        indices, indptr = [], [0]
+        for text in texts:
+            indices.extend(self.vocabulary[word] for word in extract_tokens(text, self.stop_words) if word in self.vocabulary)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float64)
+        return csr_matrix((data, indices, indptr), shape=(len(texts), len(self.vocabulary)))
+
+    def fit(self, texts, labels):
+        texts, labels = list(texts), list(labels)
+        for text in texts:
+            for word in extract_tokens(text, self.stop_words):
+                self.vocabulary.setdefault(word, len(self.vocabulary))
+        self.categories, label_index = np.unique(labels, return_inverse=True)
+        counts = self.encode(texts)
+        one_hot = csr_matrix((np.ones(len(labels)), (label_index, np.arange(len(labels)))),
+                             shape=(len(self.categories), len(labels)))
+        feature_count = np.asarray((one_hot @ counts).todense()) + self.alpha
+        self.feature_log_prob = np.log(feature_count / feature_count.sum(axis=1, keepdims=True))
+        self.class_log_prior = np.log(np.bincount(label_index) / len(labels))
+        return self
+
+    def predict_proba(self, texts):
+        """(len(texts) x categories) posterior probabilities."""
+        joint = self.encode(texts) @ self.feature_log_prob.T + self.class_log_prior
+        joint -= joint.max(axis=1, keepdims=True)
+        probabilities = np.exp(joint)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def classify(self, texts, threshold=0.5):
+        """Top category per text, or 'uncategorized' below the confidence threshold."""
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        confident = probabilities[np.arange(len(best)), best] >= threshold
+        return np.where(confident, self.categories[best], 'uncategorized').tolist()
+
+# Reviewed (gift, category) pairs from a CSV with Gift and Category columns, e.g. categorized_gifts.csv
+def load_training_data(file_path):
+    rows = read_table(file_path, columns=['Gift', 'Category']).dropna()
+    rows = rows[rows['Category'] != 'uncategorized']
+    return list(zip(rows['Gift'], rows['Category']))
+
+# Train the classifier on the sample data plus an optional training CSV
+@instrumented
+def train_classifier(training_path=None, stop_words=None):
+    samples = training_data + (load_training_data(training_path) if training_path else [])
+    texts, labels = zip(*samples)
+    return NaiveBayesGiftClassifier(stop_words or load_stop_words()).fit(texts, labels)
+
+# Hash of everything the trained model depends on
+def training_digest(training_path=None):
+    digest = hashlib.sha256(f"gift-model-v{MODEL_VERSION}".encode())
+    digest.update(repr(training_data).encode())
+    if training_path:
+        with open(training_path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Load the saved model, retraining only when the training data changed
+@instrumented
+def load_or_train_model(training_path=None, model_path=MODEL_PATH):
+    """
+    Return the gift classifier, building it once and reusing it afterwards.
+
+    The saved artifact holds the classifier (vocabulary, log probabilities
+    and stopword set) with MODEL_VERSION and a hash of the training data. It
+    is only retrained when either changes, and nothing is ever downloaded.
+    """
+    digest = training_digest(training_path)
+    if os.path.exists(model_path):
+        with open(model_path, 'rb') as f:
+            artifact = pickle.load(f)
+        if artifact.get('version') == MODEL_VERSION and artifact.get('training_hash') == digest:
+            return artifact['classifier']
+
+    model = train_classifier(training_path)
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    temp_path = f"{model_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump({'version': MODEL_VERSION, 'training_hash': digest, 'classifier': model}, f)
+    os.replace(temp_path, model_path)
+    return model
+
+_classifier = None
+
+def get_classifier():
+    """The default model, loaded from MODEL_PATH on first use."""
+    global _classifier
+    if _classifier is None:
+        _classifier = load_or_train_model()
+    return _classifier
+
+def classify_product_with_uncategorized(text, threshold=0.5):
+    """
+    Classify a product and return 'uncategorized' if the confidence is below the threshold.
+    """
+    return get_classifier().classify([text], threshold)[0]
+
+# Fallback keywords, in priority order: the first category with any keyword in the name wins
+CATEGORY_KEYWORDS = [
+    ('Musical Instruments', ['music', 'instrument', 'drum', 'guitar', 'piano', 'violin', 'trumpet']),
+    ('Arts and Crafts', ['art', 'drawing', 'painting', 'craft', 'sculpture']),
+    ('Educational Kit', ['science', 'lab', 'kit', 'biology', 'robot', 'engineering']),
+    ('Games and Puzzles', ['game', 'board', 'puzzle', 'strategy', 'trivia']),
+    ('Outdoor Activities', ['outdoor', 'camping', 'hiking', 'adventure', 'fishing']),
+    ('Toys and Vehicles', ['toy', 'figure', 'doll', 'lego', 'action', 'vehicle']),
+    ('Food Cooking', ['kitchen', 'cooking', 'food', 'baking']),
+    ('Animal and Nature', ['animal', 'zoo', 'farm', 'wildlife', 'pet']),
+]
+
+# One pattern for every keyword: a zero-width lookahead is tried at each position, and its
+# capture groups are ordered by category priority, so lastindex names the best category
+# starting there even when keywords overlap
+_keyword_pattern = re.compile('(?=(?:' + '|'.join(
+    '(' + '|'.join(map(re.escape, keywords)) + ')' for _, keywords in CATEGORY_KEYWORDS) + '))')
+
+def categorize_gift(gift_name):
+    """
+    Fallback categorization using keywords if classification fails.
+    """
+    best = len(CATEGORY_KEYWORDS)
+    for match in _keyword_pattern.finditer(gift_name.lower()):
+        best = min(best, match.lastindex - 1)
+        if best == 0:
+            break
+    return CATEGORY_KEYWORDS[best][0] if best < len(CATEGORY_KEYWORDS) else 'Miscellaneous'
+
+@instrumented
+def categorize_gifts(gift_names, model=None, threshold=0.5):
+    """
+    Categorize a batch of gift names, classifying each distinct name only once.
+    """
+    model = model or get_classifier()
+    codes, uniques = pd.factorize(pd.Series(gift_names, dtype=object))
+    count('gifts_categorized', len(codes))
+    count('distinct_gifts_classified', len(uniques))
+    categories = [category if category != 'uncategorized' else categorize_gift(gift)
+                  for gift, category in zip(uniques, model.classify(list(uniques), threshold))]
+    # Missing names get code -1, which picks the trailing fallback category
+    categories.append('Miscellaneous')
+    return [categories[code] for code in codes]
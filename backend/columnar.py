@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Text columns with at most this share of distinct values are kept dictionary-encoded in memory
+CATEGORY_RATIO = 0.5
+
+# Column store directories end with this suffix
+COLUMN_STORE_SUFFIX = '.cols'
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+FEATHER_SUFFIXES = ('.feather', '.arrow')
+
+def table_format(path):
+    """'csv', 'parquet', 'feather' or 'cols', from the file extension."""
+    suffix = os.path.splitext(path.rstrip('/\\'))[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        return 'parquet'
+    if suffix in FEATHER_SUFFIXES:
+        return 'feather'
+    if suffix == COLUMN_STORE_SUFFIX:
+        return 'cols'
+    return 'csv'
+
+def is_text(column):
+    return column.dtype == object or pd.api.types.is_string_dtype(column.dtype)
+
+# Dictionary-encode repetitive text columns (Country, Location, gifts, ...)
+def encode_categories(data, ratio=CATEGORY_RATIO):
+    columns = {}
+    for name, column in data.items():
+        if is_text(column) and column.nunique(dropna=True) <= ratio * len(column):
+            columns[name] = column.astype('category')
+    return data.assign(**columns) if columns else data
+
+# fillna that also works on dictionary-encoded columns
+def fill_text(column, value=''):
+    if isinstance(column.dtype, pd.CategoricalDtype) and value not in column.cat.categories:
+        column = column.cat.add_categories([value])
+    return column.fillna(value)
+
+def _require_pyarrow(kind):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"Reading and writing {kind} files needs pyarrow (pip install pyarrow), "
+                          f"or use a {COLUMN_STORE_SUFFIX} column store instead")
+
+# Column store: one .npy file per column plus meta.json, loaded memory-mapped
+def write_column_store(data, path):
+    """
+    Save a DataFrame as a directory of NumPy column files.
+
+    Numeric, boolean and datetime columns are saved as they are. Text columns
+    are saved as int32 codes into a list of distinct values kept in
+    meta.json, with -1 for missing values.
+    """
+    os.makedirs(path, exist_ok=True)
+    meta = {'rows': len(data), 'columns': []}
+    for i, (name, column) in enumerate(data.items()):
+        entry = {'name': name, 'file': f"{i}.npy"}
+        if isinstance(column.dtype, pd.CategoricalDtype) or is_text(column):
+            codes, categories = pd.factorize(column, sort=False)
+            entry['categories'] = [str(value) for value in categories]
+            values = codes.astype(np.int32)
+        else:
+            values = column.to_numpy()
+        np.save(os.path.join(path, entry['file']), values, allow_pickle=False)
+        meta['columns'].append(entry)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+def read_column_store(path, columns=None, ratio=CATEGORY_RATIO):
+    """
+    Load a column store without parsing: every column file is memory-mapped
+    copy-on-write, so only the pages that are used are read and changes
+    never reach the file. Text columns come back as categoricals, or decoded
+    to strings when most of their values are distinct.
+    """
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    entries = {entry['name']: entry for entry in meta['columns']}
+    if columns is not None:
+        missing = [name for name in columns if name not in entries]
+        if missing:
+            raise ValueError(f"Columns not found in {path}: {missing}")
+    data = {}
+    for name in (columns if columns is not None else entries):
+        entry = entries[name]
+        values = np.load(os.path.join(path, entry['file']), mmap_mode='c', allow_pickle=False)
+        if 'categories' in entry:
+            column = pd.Categorical.from_codes(values, entry['categories'])
+            if len(entry['categories']) > ratio * meta['rows']:
+                column = pd.Series(column).astype(object)
+            values = column
+        data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+# Read a table in any supported format, chosen by extension
+def read_table(path, columns=None):
+    kind = table_format(path)
+    if kind == 'cols':
+        return read_column_store(path, columns)
+    if kind == 'parquet':
+        _require_pyarrow('Parquet')
+        return pd.read_parquet(path, columns=columns)
+    if kind == 'feather':
+        _require_pyarrow('Feather')
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+# Write a table in the format given by the extension (CSV for anything else, e.g. the frontend files)
+def write_table(data, path):
+    kind = table_format(path)
+    if kind == 'cols':
+        write_column_store(data, path)
+    elif kind == 'parquet':
+        _require_pyarrow('Parquet')
+        encode_categories(data).to_parquet(path, index=False)
+    elif kind == 'feather':
+        _require_pyarrow('Feather')
+        encode_categories(data).reset_index(drop=True).to_feather(path)
+    else:
+        data.to_csv(path, index=False)
+
+def convert(source, target):
+    write_table(read_table(source), target)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a kid table between CSV, Parquet, Feather and "
+                                                 f"{COLUMN_STORE_SUFFIX} column stores.")
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args()
+    convert(args.source, args.target)
+    print(f"Saved {args.source} as {args.target}")
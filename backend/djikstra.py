@@ -2,81 +2,39 @@ import csv
 import math
 import os
 import sys
-from nltk.tokenize import word_tokenize
-import pandas as pd
-import nltk
-import random
 import json
-
-# Ensure NLTK data is downloaded
-nltk_packages = ['punkt']
-for package in nltk_packages:
-    try:
-        nltk.data.find(f'tokenizers/{package}')
-    except LookupError:
-        nltk.download(package)
-
-# Load AFINN sentiment scores
-def load_afinn(file_path):
-    if not os.path.exists(file_path):
-        print(f"AFINN file not found at path: {file_path}")
-        sys.exit(1)
-    afinn = {}
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            word, score = line.strip().split('\t')
-            afinn[word] = int(score)
-    return afinn
-
-# Compute sentiment score for a given text
-def compute_action_score(text, afinn):
-    tokens = word_tokenize(str(text).lower())
-    return sum(afinn.get(token, 0) for token in tokens)
+import time
+import argparse
+import gzip
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.spatial import cKDTree
+from columnar import read_table
+from instrumentation import count, enable, instrumented
+from random_streams import sample_positions
+from scoring import load_scored_kids
+from Horn_probability_finished import SANTA_SIZE, fit_probabilities, horn_diameters
 
 # Load data from CSV
+@instrumented
 def load_data(file_path):
     if not os.path.exists(file_path):
         print(f"Data file not found at path: {file_path}")
         sys.exit(1)
-    data = pd.read_csv(file_path)
+    data = read_table(file_path)
     expected_columns = {'Latitude', 'Longitude', 'Good_Deed', 'Bad_Deed', 'School_Grades', 'Listened_To_Parents'}
     if not expected_columns.issubset(set(data.columns)):
         missing = expected_columns - set(data.columns)
         print(f"Missing columns in data: {missing}")
         sys.exit(1)
+    count('rows_loaded', len(data))
     return data
 
-# Calculate scores and divide into groups
-def calculate_scores(data, afinn):
-    # Compute good and bad deed scores
-    data['Good_Score'] = data['Good_Deed'].apply(lambda x: compute_action_score(x, afinn))
-    data['Bad_Score'] = data['Bad_Deed'].apply(lambda x: compute_action_score(x, afinn))
-
-    # Normalize scores
-    min_good_score = abs(data['Good_Score'].min()) + 1
-    data['Good_Score'] += min_good_score
-
-    min_bad_score = abs(data['Bad_Score'].min())
-    data['Bad_Score'] += min_bad_score
-
-    # Combined Score
-    data['Combined_Score'] = data['Good_Score'] - data['Bad_Score']
-
-    # Adjust for school grades and listening
-    data['School_Grades'] = data['School_Grades'].fillna(data['School_Grades'].mean())
-    data['Listened_To_Parents'] = data['Listened_To_Parents'].fillna(data['Listened_To_Parents'].mean())
-
-    data['Final_Score'] = (
-        data['Combined_Score'] +
-        data['School_Grades'] / data['School_Grades'].max() +
-        data['Listened_To_Parents'] / data['Listened_To_Parents'].max()
-    )
-
-    average_score = data['Final_Score'].mean()
-
-    # Split into groups
-    good_kids = data[data['Final_Score'] >= average_score].reset_index(drop=True)
-    bad_kids = data[data['Final_Score'] < average_score].reset_index(drop=True)
+# Divide an already scored table into good and bad kids
+def split_groups(data):
+    good_kids = data[data['Good/Bad'] == 'Good'].reset_index(drop=True)
+    bad_kids = data[data['Good/Bad'] == 'Bad'].reset_index(drop=True)
 
     print(f"Total Kids: {len(data)}")
     print(f"Good Kids: {len(good_kids)}")
@@ -84,9 +42,17 @@ def calculate_scores(data, afinn):
 
     return good_kids, bad_kids
 
+EARTH_RADIUS_KM = 6371
+
+# Default cap on the number of kids routed per group (0 routes everyone)
+MAX_KIDS_PER_GROUP = 75
+
+# Default rows of the distance matrix computed per block
+BLOCK_SIZE = 1024
+
 # Calculate the great-circle distance using the Haversine formula
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # Radius of the Earth in km
+    R = EARTH_RADIUS_KM  # Radius of the Earth in km
     lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
     dlat = lat2 - lat1
     dlon = lon2 - lon1
@@ -95,8 +61,10 @@ def haversine(lat1, lon1, lat2, lon2):
     return R * c
 
 # Build distance matrix
+@instrumented
 def build_distance_matrix(locations):
     n = len(locations)
+    count('matrix_cells', n * n)
     distance_matrix = [[0] * n for _ in range(n)]
     for i in range(n):
         for j in range(i + 1, n):
@@ -105,122 +73,631 @@ def build_distance_matrix(locations):
             distance_matrix[j][i] = distance
     return distance_matrix
 
+# Build the same distance matrix with NumPy broadcasting
+@instrumented
+def build_distance_matrix_vectorized(locations, dtype=np.float64, block_size=None):
+    """
+    Vectorized replacement for build_distance_matrix returning an (n, n) array.
+
+    Coordinates are converted to radians once and each block of rows is
+    computed against every location in a single broadcast. Use
+    dtype=np.float32 to halve the memory of the result and block_size to
+    bound the temporaries to block_size x n cells for large inputs.
+    """
+    coords = np.radians(np.asarray(locations, dtype=np.float64).reshape(-1, 2)).astype(dtype, copy=False)
+    n = len(coords)
+    count('matrix_cells', n * n)
+    lat, lon = coords[:, 0], coords[:, 1]
+    cos_lat = np.cos(lat)
+    distance_matrix = np.empty((n, n), dtype=dtype)
+    step = n if not block_size else int(block_size)
+    for start in range(0, n, max(step, 1)):
+        stop = min(start + step, n)
+        dlat = lat[np.newaxis, :] - lat[start:stop, np.newaxis]
+        dlon = lon[np.newaxis, :] - lon[start:stop, np.newaxis]
+        a = np.sin(dlat / 2) ** 2 + cos_lat[start:stop, np.newaxis] * cos_lat[np.newaxis, :] * np.sin(dlon / 2) ** 2
+        np.clip(a, 0, 1, out=a)
+        distance_matrix[start:stop] = EARTH_RADIUS_KM * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+    return distance_matrix
+
 # Solve TSP using a greedy nearest neighbor approach
+@instrumented
 def solve_tsp_greedy(distance_matrix, start_index):
+    distance_matrix = np.asarray(distance_matrix)
     n = len(distance_matrix)
-    visited = [False] * n
+    unvisited = np.ones(n, dtype=bool)
     path = [start_index]
-    visited[start_index] = True
-    total_distance = 0
+    unvisited[start_index] = False
+    total_distance = 0.0
     for _ in range(n - 1):
-        last = path[-1]
-        nearest = -1
-        min_distance = float('inf')
-        for i in range(n):
-            if not visited[i] and distance_matrix[last][i] < min_distance:
-                nearest = i
-                min_distance = distance_matrix[last][i]
-        if nearest == -1:
+        # Scan the whole row at once, masking out the kids already visited
+        row = np.where(unvisited, distance_matrix[path[-1]], np.inf)
+        nearest = int(np.argmin(row))
+        min_distance = row[nearest]
+        if not min_distance < np.inf:
             break
         path.append(nearest)
-        visited[nearest] = True
-        total_distance += min_distance
+        unvisited[nearest] = False
+        total_distance += float(min_distance)
 
     # Return to starting point
     if n > 1:
-        total_distance += distance_matrix[path[-1]][path[0]]
+        total_distance += float(distance_matrix[path[-1], path[0]])
         path.append(start_index)
 
+    count('tsp_nodes_visited', len(path))
     return path, total_distance
 
-# Function to calculate the probability Santa can fit through the horn
-def calculate_fit_probability(santa_size, horn_diameter):
-    if santa_size <= horn_diameter:
-        return 1.0  # 100% probability
-    else:
-        return math.exp(-(santa_size - horn_diameter) / horn_diameter)
+# Convert (lat, lon) pairs to 3D points on the unit sphere
+def to_unit_vectors(locations):
+    coords = np.radians(np.asarray(locations, dtype=np.float64).reshape(-1, 2))
+    lat, lon = coords[:, 0], coords[:, 1]
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+# Total haversine length of a path over the given locations
+def path_length(locations, path_indices):
+    if len(path_indices) < 2:
+        return 0.0
+    coords = np.radians(np.asarray(locations, dtype=np.float64).reshape(-1, 2))[np.asarray(path_indices)]
+    lat, lon = coords[:, 0], coords[:, 1]
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    np.clip(a, 0, 1, out=a)
+    return float(np.sum(EARTH_RADIUS_KM * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))))
+
+# Solve TSP using a greedy nearest neighbor approach backed by a KD-tree
+@instrumented
+def solve_tsp_kdtree(locations, start_index, rebuild_fraction=0.5, max_probe=64):
+    """
+    Nearest neighbour tour that never builds the n x n distance matrix.
+
+    Kids sharing a coordinate are collapsed into one site first: the tour
+    visits sites and, at each one, all of its kids back to back (they are
+    0 km apart, so nearest neighbour would do the same). Sites are indexed
+    in a KD-tree over unit-sphere vectors, where chord distance orders
+    points exactly like great-circle distance. Visited sites are deleted
+    lazily: they are skipped in query results and the tree is rebuilt over
+    the remaining sites once they drop below rebuild_fraction of its size,
+    or as soon as max_probe nearest sites all turn out visited, so memory
+    and time stay close to linear in the number of kids. Returns the same
+    (path, total_distance) pair as solve_tsp_greedy.
+    """
+    coords = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    if n == 0:
+        return [], 0.0
+
+    unique_coords, site_of = np.unique(coords, axis=0, return_inverse=True)
+    site_of = site_of.reshape(-1)
+    # Kids of each site, in table order
+    by_site = np.argsort(site_of, kind='stable')
+    site_kids = np.split(by_site, np.cumsum(np.bincount(site_of, minlength=len(unique_coords)))[:-1])
+    count('tsp_sites', len(unique_coords))
+
+    points = to_unit_vectors(unique_coords)
+    start_site = int(site_of[start_index])
+    unvisited = np.ones(len(points), dtype=bool)
+    unvisited[start_site] = False
+    remaining = len(points) - 1
+    alive = np.arange(len(points))
+    tree = cKDTree(points)
+    sites = [start_site]
+    while remaining:
+        if remaining <= len(alive) * rebuild_fraction:
+            alive = np.flatnonzero(unvisited)
+            tree = cKDTree(points[alive])
+        k = min(8, len(alive))
+        while True:
+            _, idx = tree.query(points[sites[-1]], k=k)
+            candidates = alive[np.atleast_1d(idx)]
+            mask = unvisited[candidates]
+            if mask.any() or k == len(alive):
+                break
+            if k >= max_probe:
+                # Surrounded by visited sites: drop them instead of widening the search further
+                alive = np.flatnonzero(unvisited)
+                tree = cKDTree(points[alive])
+                k = min(8, len(alive))
+                continue
+            k = min(k * 2, len(alive))
+        # Query results are sorted by distance, so the first unvisited hit is the nearest
+        nearest = int(candidates[np.argmax(mask)])
+        sites.append(nearest)
+        unvisited[nearest] = False
+        remaining -= 1
+
+    path = [start_index] + [int(kid) for kid in site_kids[start_site] if kid != start_index]
+    for site in sites[1:]:
+        path.extend(site_kids[site].tolist())
+    # Return to starting point
+    if n > 1:
+        path.append(start_index)
+
+    count('tsp_nodes_visited', len(path))
+    return path, path_length(locations, path)
+
+# Improve a closed tour with 2-opt and Or-opt moves until the budget runs out
+@instrumented
+def improve_tour(locations, path_indices, time_budget=5.0, max_iterations=None, neighbours=8):
+    """
+    Local search over a closed tour such as the one from solve_tsp_greedy.
+
+    Only moves towards each kid's `neighbours` nearest kids are tried, and a
+    kid is only re-examined after one of its tour edges changed (don't-look
+    bits). The start of the tour stays in place. Stops once time_budget
+    seconds have passed or max_iterations improving moves were applied.
+    Returns (path, total_distance, distance_saved).
+    """
+    initial_distance = path_length(locations, path_indices)
+    tour = list(path_indices[:-1]) if len(path_indices) > 1 else list(path_indices)
+    n = len(tour)
+    if n < 5:
+        return list(path_indices), initial_distance, 0.0
+
+    coords = np.radians(np.asarray(locations, dtype=np.float64).reshape(-1, 2))
+    lat = coords[:, 0].tolist()
+    lon = coords[:, 1].tolist()
+    cos_lat = np.cos(coords[:, 0]).tolist()
+
+    def dist(a, b):
+        h = math.sin((lat[b] - lat[a]) / 2) ** 2 + cos_lat[a] * cos_lat[b] * math.sin((lon[b] - lon[a]) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(h, 1.0)))
+
+    # Candidate lists: each kid's nearest kids on the tour
+    k = min(neighbours, n - 1)
+    points = to_unit_vectors(np.asarray(locations, dtype=np.float64).reshape(-1, 2)[tour])
+    _, nearest = cKDTree(points).query(points, k=k + 1)
+    candidates = {}
+    for row, node in enumerate(tour):
+        candidates[node] = [tour[j] for j in nearest[row] if tour[j] != node][:k]
+
+    pos = {node: i for i, node in enumerate(tour)}
+    queue = deque(tour)
+    queued = set(tour)
+    deadline = time.perf_counter() + time_budget
+    moves = 0
+    eps = 1e-9
+
+    def activate(*nodes):
+        for node in nodes:
+            if node not in queued:
+                queued.add(node)
+                queue.append(node)
+
+    def reverse(i, j):
+        # Reverse tour[i..j] in place (1 <= i <= j < n, so the start never moves)
+        tour[i:j + 1] = tour[i:j + 1][::-1]
+        for p in range(i, j + 1):
+            pos[tour[p]] = p
+
+    def try_2opt(a):
+        i = pos[a]
+        for succ in (True, False):
+            b = tour[(i + 1) % n] if succ else tour[i - 1]
+            d_ab = dist(a, b)
+            for c in candidates[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_ab:
+                    break
+                j = pos[c]
+                d = tour[(j + 1) % n] if succ else tour[j - 1]
+                if c == b or d == a:
+                    continue
+                delta = d_ac + dist(b, d) - d_ab - dist(c, d)
+                if delta < -eps:
+                    # Edges (a, b) and (c, d) become (a, c) and (b, d)
+                    p1, p2 = (i, j) if succ else ((i - 1) % n, (j - 1) % n)
+                    lo, hi = min(p1, p2), max(p1, p2)
+                    reverse(lo + 1, hi)
+                    activate(a, b, c, d)
+                    return True
+        return False
+
+    def try_or_opt(a):
+        for length in (1, 2, 3):
+            s = pos[a]
+            if s == 0 or s + length > n:
+                continue
+            segment = tour[s:s + length]
+            p, q = tour[s - 1], tour[(s + length) % n]
+            first, last = segment[0], segment[-1]
+            removal_gain = dist(p, first) + dist(last, q) - dist(p, q)
+            for end in (first, last):
+                for c in candidates[end]:
+                    if c in segment or c == p:
+                        continue
+                    e = tour[(pos[c] + 1) % n]
+                    if e in segment:
+                        continue
+                    d_ce = dist(c, e)
+                    forward = dist(c, first) + dist(last, e) - d_ce
+                    backward = dist(c, last) + dist(first, e) - d_ce
+                    if min(forward, backward) - removal_gain < -eps:
+                        moved = segment if forward <= backward else segment[::-1]
+                        del tour[s:s + length]
+                        insert_at = (pos[c] - length if pos[c] > s else pos[c]) + 1
+                        tour[insert_at:insert_at] = moved
+                        lo = min(s, insert_at)
+                        hi = max(s + length, insert_at + length)
+                        for idx in range(lo, min(hi, n)):
+                            pos[tour[idx]] = idx
+                        activate(p, q, c, e, first, last)
+                        return True
+        return False
+
+    while queue:
+        if time.perf_counter() > deadline or (max_iterations is not None and moves >= max_iterations):
+            break
+        a = queue.popleft()
+        queued.discard(a)
+        if try_2opt(a) or try_or_opt(a):
+            moves += 1
+
+    path = tour + [tour[0]]
+    total_distance = path_length(locations, path)
+    count('improving_moves', moves)
+    return path, total_distance, initial_distance - total_distance
+
+# Keys of the kids' random streams: Child_ID, or the row position when the table has none
+def kid_keys(kids):
+    return kids['Child_ID'].to_numpy() if 'Child_ID' in kids.columns else np.arange(len(kids))
+
+# Fit probabilities from updated_santa.csv, sampling horn sizes only when the column is missing
+def horn_fit_probabilities(kids, santa_size=SANTA_SIZE):
+    if 'Fit Probability' in kids.columns:
+        return kids['Fit Probability'].to_numpy(dtype=np.float64)
+    return fit_probabilities(santa_size, horn_diameters(kid_keys(kids)))
 
 # Function to convert path indices to GeoJSON LineString coordinates
-def path_to_geojson(kids, path_indices, group_name):
-    path_coords = [[kids.iloc[idx]['Longitude'], kids.iloc[idx]['Latitude']] for idx in path_indices]
+@instrumented
+def path_to_geojson(kids, path_indices, group_name, precision=None, polyline=False):
+    """
+    Build the route Feature, gathering every coordinate with one fancy-index call.
+
+    precision rounds coordinates to that many decimals (5 is about 1 m). With
+    polyline=True the route is stored as an encoded polyline string in the
+    "polyline" property instead of a coordinate list.
+    """
+    coords = kids[['Longitude', 'Latitude']].to_numpy(dtype=np.float64)[np.asarray(path_indices, dtype=np.intp)]
+    count('route_points', len(coords))
     geojson = {
         "type": "Feature",
         "properties": {
             "group": group_name
         },
-        "geometry": {
-            "type": "LineString",
-            "coordinates": path_coords
-        }
+        "geometry": None
+    }
+    if polyline:
+        precision = 5 if precision is None else precision
+        geojson["properties"].update({"polyline": encode_polyline(coords[:, ::-1], precision),
+                                      "precision": precision})
+        return geojson
+    if precision is not None:
+        coords = np.round(coords, precision)
+    geojson["geometry"] = {
+        "type": "LineString",
+        "coordinates": coords.tolist()
     }
     return geojson
 
-# Main execution
-def main():
-    afinn_path = 'AFINN-111.txt'
-    data_path = 'updated_santa.csv'
-
-    # Load AFINN scores and data
-    afinn = load_afinn(afinn_path)
-    data = load_data(data_path)
-
-    # Compute scores and separate into groups
-    good_kids, bad_kids = calculate_scores(data, afinn)
-
-    # Function to process kids and solve TSP
-    def process_kids(kids, group_name):
-        santa_size = 83.82  # Example Santa size in cm
-        horn_diameters = [random.uniform(50, 150) for _ in range(len(kids))]  # Example horn sizes in cm
+# Encoded polyline (Google's algorithm) of (lat, lon) points, vectorized over all points
+def encode_polyline(lat_lon, precision=5):
+    """
+    Encode points as deltas of rounded integers, zigzagged and split into
+    5-bit chunks of printable characters.
+    """
+    values = np.round(np.asarray(lat_lon, dtype=np.float64).reshape(-1, 2) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=0).ravel()
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+    # Up to 13 chunks of 5 bits cover any 64-bit value
+    shifts = np.arange(13, dtype=np.uint64) * np.uint64(5)
+    chunks = (zigzag[:, None] >> shifts) & np.uint64(31)
+    lengths = np.maximum(1, ((zigzag[:, None] >> shifts) != 0).sum(axis=1))
+    position = np.arange(13)
+    used = position < lengths[:, None]
+    continued = position < (lengths - 1)[:, None]
+    chars = (chunks | np.where(continued, 0x20, 0).astype(np.uint64)) + np.uint64(63)
+    return chars[used].astype(np.uint8).tobytes().decode('ascii')
+
+# Write GeoJSON compactly when indent is None, plus optional precompressed sidecar files
+@instrumented
+def write_geojson(data, output_json, indent=4, compress=()):
+    if indent is None:
+        text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=indent)
+    payload = text.encode('utf-8')
+    count('bytes_written', len(payload))
+    with open(output_json, "wb") as f:
+        f.write(payload)
+    sizes = [f"{len(payload)} bytes"]
+    for method in compress:
+        if method == 'gzip':
+            compressed, suffix = gzip.compress(payload, compresslevel=9, mtime=0), '.gz'
+        else:
+            try:
+                import brotli
+            except ImportError:
+                print("brotli is not installed, skipping the .br file")
+                continue
+            compressed, suffix = brotli.compress(payload, quality=11), '.br'
+        with open(output_json + suffix, "wb") as f:
+            f.write(compressed)
+        sizes.append(f"{len(compressed)} bytes {method}")
+    return ", ".join(sizes)
+
+# Collapse kids at the same place into shared route stops
+@instrumented
+def aggregate_stops(locations, radius_km=0):
+    """
+    Group locations into stops and return (labels, stop_locations).
+
+    With radius_km=0 only identical coordinates share a stop. Otherwise kids
+    are swept in order and each kid not yet assigned opens a stop that takes
+    every unassigned kid within radius_km of it. labels[i] is the stop of
+    location i and stop_locations holds each stop's (lat, lon).
+    """
+    coords = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    if not radius_km:
+        _, first, labels = np.unique(coords, axis=0, return_index=True, return_inverse=True)
+        # Number stops in order of first appearance
+        rank = np.empty(len(first), dtype=int)
+        rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+        labels = rank[labels.reshape(-1)]
+        return labels, [tuple(coords[i]) for i in np.sort(first)]
+
+    points = to_unit_vectors(coords)
+    chord = 2 * math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2)
+    tree = cKDTree(points)
+    labels = np.full(len(coords), -1)
+    stop_locations = []
+    for i in range(len(coords)):
+        if labels[i] >= 0:
+            continue
+        neighbours = np.asarray(tree.query_ball_point(points[i], chord), dtype=int)
+        neighbours = neighbours[labels[neighbours] < 0]
+        labels[neighbours] = len(stop_locations)
+        labels[i] = len(stop_locations)
+        stop_locations.append(tuple(coords[i]))
+    return labels, stop_locations
+
+# Turn a closed path over stops back into a closed path over kids
+def expand_stops(path_indices, labels):
+    order = np.argsort(labels, kind='stable')
+    members = np.split(order, np.cumsum(np.bincount(labels))[:-1])
+    stops = path_indices[:-1] if len(path_indices) > 1 else path_indices
+    expanded = [int(kid) for stop in stops for kid in members[stop]]
+    if len(expanded) > 1:
+        expanded.append(expanded[0])
+    return expanded
+
+# Split kids into geographic clusters, one per sleigh
+@instrumented
+def partition_locations(locations, sleighs, method='kmeans', seed=42, iterations=50):
+    """
+    Return a cluster label in [0, sleighs) for every location.
+
+    'kmeans' runs spherical k-means on unit-sphere vectors (k-means++ seeding,
+    cosine assignment); 'sweep' sorts kids by longitude and cuts the sweep
+    into equally sized time-zone bands.
+    """
+    n = len(locations)
+    sleighs = max(1, min(sleighs, n))
+    if method == 'sweep':
+        order = np.argsort(np.asarray(locations, dtype=np.float64).reshape(-1, 2)[:, 1], kind='stable')
+        labels = np.empty(n, dtype=int)
+        labels[order] = np.arange(n) * sleighs // n
+        return labels
+
+    points = to_unit_vectors(locations)
+    rng = np.random.default_rng(seed)
+    centers = [points[rng.integers(n)]]
+    for _ in range(1, sleighs):
+        gap = np.clip(1 - np.max(points @ np.array(centers).T, axis=1), 0, None)
+        total = gap.sum()
+        centers.append(points[rng.choice(n, p=gap / total) if total > 0 else rng.integers(n)])
+    centers = np.array(centers)
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        new_labels = np.argmax(points @ centers.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(sleighs):
+            members = points[labels == c]
+            if len(members):
+                centers[c] = members.sum(axis=0)
+                centers[c] /= np.linalg.norm(centers[c]) or 1
+    return labels
+
+# Worker: route one sleigh's cluster (runs in a separate process)
+def solve_cluster(locations, improve_seconds=0, improve_iterations=None):
+    easternmost_index = max(range(len(locations)), key=lambda i: locations[i][1])
+    path, total_distance = solve_tsp_kdtree(locations, easternmost_index)
+    if improve_seconds or improve_iterations:
+        path, total_distance, _ = improve_tour(locations, path, time_budget=improve_seconds or float('inf'),
+                                               max_iterations=improve_iterations)
+    return path, total_distance
 
-        # Limit to 75 kids
-        kids = kids.sample(min(len(kids), 75), random_state=42).reset_index(drop=True)
+# Route every cluster in a process pool and save the routes as a GeoJSON FeatureCollection
+@instrumented
+def process_sleighs(kids, group_name, sleighs, partition='kmeans', workers=None,
+                    improve_seconds=0, improve_iterations=None, stop_radius=None,
+                    indent=4, precision=None, polyline=False, compress=()):
+    locations = list(zip(kids['Latitude'], kids['Longitude']))
+    route_locations = locations
+    if stop_radius is not None:
+        stop_labels, route_locations = aggregate_stops(locations, stop_radius)
+    labels = partition_locations(route_locations, sleighs, method=partition)
+    clusters = [np.flatnonzero(labels == c) for c in range(labels.max() + 1)]
+    clusters = [members for members in clusters if len(members)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(solve_cluster, [route_locations[i] for i in members], improve_seconds,
+                               improve_iterations)
+                   for members in clusters]
+        results = [future.result() for future in futures]
+
+    features = []
+    total_distance = 0.0
+    print(f"\n{group_name} Kids Routes ({len(clusters)} sleighs):")
+    for sleigh, (members, (path, distance)) in enumerate(zip(clusters, results), start=1):
+        path_indices = members[path]
+        if stop_radius is not None:
+            path_indices = expand_stops(path_indices, stop_labels)
+            distance = path_length(locations, path_indices)
+        feature = path_to_geojson(kids, path_indices, group_name, precision=precision, polyline=polyline)
+        kid_count = len(set(path_indices))
+        total_distance += distance
+        feature["properties"].update({"sleigh": sleigh, "kids": kid_count, "distance_km": round(distance, 2)})
+        features.append(feature)
+        print(f"Sleigh {sleigh}: {kid_count} kids, {distance:.2f} km")
+    print(f"Total Distance: {total_distance:.2f} km")
+
+    output_json = f"{group_name.lower()}_sleighs.json"
+    sizes = write_geojson({"type": "FeatureCollection", "features": features}, output_json, indent, compress)
+    print(f"{group_name} sleigh routes saved to {output_json} ({sizes})")
+
+# Process a group of kids: solve the TSP and save the route as GeoJSON
+@instrumented
+def process_kids(kids, group_name, max_kids=MAX_KIDS_PER_GROUP, float32=False, block_size=BLOCK_SIZE, solver='matrix',
+                 improve_seconds=0, improve_iterations=None, sleighs=1, partition='kmeans', workers=None,
+                 stop_radius=None, indent=4, precision=None, polyline=False, compress=()):
+    # Limit the group size (max_kids=0 routes every kid); the pick is keyed by Child_ID when there is one
+    if max_kids:
+        kids = kids.iloc[sample_positions(kid_keys(kids), max_kids)].reset_index(drop=True)
+
+    locations = list(zip(kids['Latitude'], kids['Longitude']))
+    if not locations:
+        print(f"No locations found for {group_name} group.")
+        return
+
+    if sleighs > 1:
+        process_sleighs(kids, group_name, sleighs, partition=partition, workers=workers,
+                        improve_seconds=improve_seconds, improve_iterations=improve_iterations,
+                        stop_radius=stop_radius, indent=indent, precision=precision, polyline=polyline,
+                        compress=compress)
+        return
+
+    # Route over unique stops instead of individual kids
+    route_locations = locations
+    if stop_radius is not None:
+        stop_labels, route_locations = aggregate_stops(locations, stop_radius)
+        print(f"{group_name}: {len(locations)} kids collapsed into {len(route_locations)} stops")
+
+    # Choose the starting point as the easternmost location (highest longitude)
+    easternmost_index = max(range(len(route_locations)), key=lambda i: route_locations[i][1])
+    if solver == 'kdtree':
+        path_indices, total_distance = solve_tsp_kdtree(route_locations, easternmost_index)
+    else:
+        dtype = np.float32 if float32 else np.float64
+        distance_matrix = build_distance_matrix_vectorized(route_locations, dtype=dtype, block_size=block_size)
+        path_indices, total_distance = solve_tsp_greedy(distance_matrix, easternmost_index)
 
-        locations = list(zip(kids['Latitude'], kids['Longitude']))
-        if not locations:
-            print(f"No locations found for {group_name} group.")
-            return
+    # Optional 2-opt / Or-opt improvement of the greedy tour
+    if improve_seconds or improve_iterations:
+        path_indices, total_distance, saved = improve_tour(
+            route_locations, path_indices, time_budget=improve_seconds or float('inf'),
+            max_iterations=improve_iterations)
+        print(f"{group_name} route improved by {saved:.2f} km")
+
+    # Expand each stop back into its kids
+    if stop_radius is not None:
+        path_indices = expand_stops(path_indices, stop_labels)
+        total_distance = path_length(locations, path_indices)
+
+    # Build the route string with arrows
+    probabilities = horn_fit_probabilities(kids)
+    route_parts = []
+    for idx in path_indices:
+        if 'Child_ID' in kids.columns:
+            name = kids.loc[idx, 'Child_ID']
+        elif 'Name' in kids.columns:
+            name = kids.loc[idx, 'Name']
+        else:
+            name = f"Kid {idx}"
+        lat = kids.loc[idx, 'Latitude']
+        lon = kids.loc[idx, 'Longitude']
+        probability = probabilities[idx]
+        message = "You can enter safely." if probability >= 0.7 else "Rudolph suggests skipping the cookies."
+        route_parts.append(f"{name} (Lat: {lat:.6f}, Lon: {lon:.6f}) - Probability: {probability:.2f} => {message}")
+
+    route_str = " \u2192 ".join(route_parts)
+
+    print(f"\n{group_name} Kids Route:")
+    print(f"Total Distance: {total_distance:.2f} km")
+    print("Visit Order:")
+    print(route_str)
+
+    # Convert path to GeoJSON and save
+    geojson = path_to_geojson(kids, path_indices, group_name, precision=precision, polyline=polyline)
+    output_json = f"{group_name.lower()}_path.json"
+    sizes = write_geojson(geojson, output_json, indent, compress)
+    print(f"{group_name} path saved to {output_json} ({sizes})")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute Santa's sleigh routes for the good and bad kids.")
+    parser.add_argument('--input', default='updated_santa.csv',
+                        help="Kid table with horn probabilities (.csv, .parquet, .feather or .cols).")
+    parser.add_argument('--max-kids', type=int, default=MAX_KIDS_PER_GROUP,
+                        help="Kids sampled per group before routing (0 routes every kid).")
+    parser.add_argument('--float32', action='store_true',
+                        help="Store the distance matrix as float32 to halve its memory.")
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                        help="Rows of the distance matrix computed per block (0 computes it in one go).")
+    parser.add_argument('--solver', choices=['matrix', 'kdtree'], default='matrix',
+                        help="Nearest neighbour over a full distance matrix or a KD-tree (linear memory).")
+    parser.add_argument('--improve', type=float, default=0, metavar='SECONDS',
+                        help="Time budget for 2-opt / Or-opt improvement of each route (0 disables it).")
+    parser.add_argument('--improve-iterations', type=int, default=None,
+                        help="Stop the improvement after this many improving moves.")
+    parser.add_argument('--sleighs', type=int, default=1,
+                        help="Split each group into this many geographic clusters routed in parallel.")
+    parser.add_argument('--partition', choices=['kmeans', 'sweep'], default='kmeans',
+                        help="Spherical k-means clusters or equal-size longitude (time-zone) bands.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes used to route the sleighs (defaults to every core).")
+    parser.add_argument('--stop-radius', type=float, default=None, metavar='KM',
+                        help="Collapse kids within KM of each other into one stop before routing "
+                             "(0 only merges identical coordinates).")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Write a JSON report of stage timings, memory and counters to PATH.")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also record tracemalloc peaks per stage in the metrics report (slower).")
+    parser.add_argument('--compact', action='store_true',
+                        help="Write the route files without indentation, coordinates rounded to 5 decimals.")
+    parser.add_argument('--precision', type=int, default=None,
+                        help="Round route coordinates to this many decimals.")
+    parser.add_argument('--polyline', action='store_true',
+                        help="Store each route as an encoded polyline string instead of a coordinate list.")
+    parser.add_argument('--compress', choices=['gzip', 'brotli'], action='append', default=[],
+                        help="Also write a precompressed .gz / .br copy of each route file (repeatable).")
+    return parser.parse_args(argv)
 
-        distance_matrix = build_distance_matrix(locations)
+# Main execution
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics:
+        enable(args.metrics, trace_memory=args.trace_memory)
+    afinn_path = 'AFINN-111.txt'
+    data_path = args.input
 
-        # Choose the starting point as the easternmost location (highest longitude)
-        easternmost_index = max(range(len(locations)), key=lambda i: locations[i][1])
-        path_indices, total_distance = solve_tsp_greedy(distance_matrix, easternmost_index)
+    # Load the scored data (cached until the data or AFINN file change) and separate into groups
+    data = load_scored_kids(data_path, afinn_path, read=load_data)
+    good_kids, bad_kids = split_groups(data)
 
-        # Build the route string with arrows
-        route_parts = []
-        for idx in path_indices:
-            if 'Child_ID' in kids.columns:
-                name = kids.loc[idx, 'Child_ID']
-            elif 'Name' in kids.columns:
-                name = kids.loc[idx, 'Name']
-            else:
-                name = f"Kid {idx}"
-            lat = kids.loc[idx, 'Latitude']
-            lon = kids.loc[idx, 'Longitude']
-            horn_diameter = horn_diameters[idx]
-            probability = calculate_fit_probability(santa_size, horn_diameter)
-            message = "You can enter safely." if probability >= 0.7 else "Rudolph suggests skipping the cookies."
-            route_parts.append(f"{name} (Lat: {lat:.6f}, Lon: {lon:.6f}) - Probability: {probability:.2f} => {message}")
-
-        route_str = " \u2192 ".join(route_parts)
-
-        print(f"\n{group_name} Kids Route:")
-        print(f"Total Distance: {total_distance:.2f} km")
-        print("Visit Order:")
-        print(route_str)
-
-        # Convert path to GeoJSON and save
-        geojson = path_to_geojson(kids, path_indices, group_name)
-        output_json = f"{group_name.lower()}_path.json"
-        with open(output_json, "w", encoding="utf-8") as f:
-            json.dump(geojson, f, ensure_ascii=False, indent=4)
-        print(f"{group_name} path saved to {output_json}")
+    options = dict(max_kids=args.max_kids, float32=args.float32, block_size=args.block_size, solver=args.solver,
+                   improve_seconds=args.improve, improve_iterations=args.improve_iterations,
+                   sleighs=args.sleighs, partition=args.partition, workers=args.workers,
+                   stop_radius=args.stop_radius, indent=None if args.compact else 4,
+                   precision=5 if args.compact and args.precision is None else args.precision,
+                   polyline=args.polyline, compress=args.compress)
 
     # Process Good Kids
-    process_kids(good_kids, "Good")
+    process_kids(good_kids, "Good", **options)
 
     # Process Bad Kids
-    process_kids(bad_kids, "Bad")
+    process_kids(bad_kids, "Bad", **options)
 
 if __name__ == "__main__":
     main()
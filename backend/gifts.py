@@ -0,0 +1,127 @@
+import heapq
+import math
+from collections import Counter
+import numpy as np
+from columnar import read_table
+from instrumentation import count, instrumented
+from random_streams import RUN_SEED, uniform
+
+# Expanded gift dictionary
+gifts_by_loveometer = {
+    (0.9, 1.0): ["Advanced Drawing Kit", "Classic Board Game Collection", "DIY Science Project Kit", "Acoustic Guitar for Beginners", "Lego Creator Set", "High-Quality Sketchpad with Pencils", "Portable Chess Set", "Simple Robotics Kit", "Nature Explorer Backpack"],
+    (0.8, 0.9): ["Basic Telescope with Star Map", "Eco-Friendly Craft Supplies", "Interactive Globe", "RC Car with LED Lights", "Outdoor Adventure Kit", "Beginner's Watercolor Set", "Animal Habitat Flashcards", "Magnetic Building Blocks", "Fun Geography Puzzle"],
+    (0.7, 0.8): ["Pocket Microscope", "Beginner's Calligraphy Set", "Wildlife Observation Cards", "DIY Birdhouse Kit", "Painting Set with Acrylics", "Easy-to-Assemble Puzzle", "Solar-Powered Toy Car Kit", "Kid-Friendly Gardening Set", "Simple Experiment Tools"],
+    (0.6, 0.7): ["Children's Encyclopedia", "Nature-Themed Coloring Book", "World Map Puzzle", "Storybook of Great Inventors", "Origami Starter Pack", "Wooden Train Set", "Mini Art Canvas Kit", "Animal Sticker Collection", "DIY Bracelet Kit"],
+    (0.5, 0.6): ["Science Experiment Kit", "Basic Craft Kit", "Simple Puzzle Book", "Solar System Stickers", "Eco-Friendly Notebook", "Educational Flashcards", "DIY Art Frame Kit", "Build-A-Robot Activity Sheet", "Math Game for Kids"],
+    (0.4, 0.5): ["Coloring and Activity Pack", "Learning Flashcards", "Geometric Shapes Set", "Simple Crafting Tools", "Animal Fact Book", "DIY Bookmark Kit", "Matching Puzzle Game", "Kid-Sized Ruler and Protractor", "Word Search Book"],
+    (0.3, 0.4): ["Mindfulness Activity Book", "Simple Drawing Pad", "Stickers for Good Behavior", "DIY Friendship Bracelets", "Color-Me Poster", "Animal Masks to Decorate", "Card Matching Game", "Kindness Journal", "DIY Collage Kit"],
+    (0.2, 0.3): ["Sharing Board Game", "Teamwork-Themed Storybook", "Simple Habit Tracker", "Good Behavior Chart", "Encouragement Bookmark Set", "Magnetic Animal Figures", "Build-A-House Puzzle", "DIY Mask Kit", "Animal-Themed Puzzle"],
+    (0.1, 0.2): ["Kindness Sticker Sheet", "Simple Cooperation Game", "Short Stories of Good Morals", "Behavior Improvement Journal", "Matching Card Game", "DIY Reward Chart", "Coloring Pages Pack", "Craft Stick Activity Kit", "Basic Building Blocks"],
+    (0, 0.1): ["Positive Behavior Workbook", "Simple Team Game", "Feelings and Emotions Flashcards", "Responsibility Chart", "Simple Jigsaw Puzzle", "Kindness Coloring Sheets", "DIY Positive Affirmation Cards", "Storybook About Problem-Solving", "Good Deeds Roleplay Cards"]
+}
+
+# Gifts handed out when a kid's score falls outside every band
+NO_GIFT = "No gift"
+
+# Bands sorted by lower edge, with their gifts flattened for vectorized lookup
+_bands = sorted(gifts_by_loveometer.items())
+_lower_edges = np.array([low for (low, _), _ in _bands], dtype=np.float64)
+_upper_edges = np.array([high for (_, high), _ in _bands], dtype=np.float64)
+_band_sizes = np.array([len(gifts) for _, gifts in _bands])
+_band_offsets = np.concatenate(([0], np.cumsum(_band_sizes)[:-1]))
+_all_gifts = np.array([gift for _, gifts in _bands for gift in gifts] + [NO_GIFT], dtype=object)
+
+# Assign gifts
+@instrumented
+def assign_gifts(scores, seed=RUN_SEED, child_ids=None):
+    """
+    Pick a random gift from each kid's loveometer band in one pass.
+
+    Scores are binned with searchsorted on the sorted band edges. Bands are
+    half-open [low, high) except the top one, which also takes a perfect 1.0.
+    Scores outside every band get NO_GIFT. Each kid's draw is keyed by
+    (seed, Child_ID), so a kid gets the same gift whether the list is scored
+    whole, in shards or in another order; without child_ids the positions
+    in scores are used as IDs.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    count('gifts_assigned', len(scores))
+    band = np.searchsorted(_lower_edges, scores, side='right') - 1
+    clipped = np.clip(band, 0, len(_bands) - 1)
+    in_band = (band >= 0) & ((scores < _upper_edges[clipped]) |
+                             ((clipped == len(_bands) - 1) & (scores == _upper_edges[-1])))
+
+    if child_ids is None:
+        child_ids = np.arange(len(scores))
+    draws = uniform(seed, child_ids, 'gift')
+    choice = _band_offsets[clipped] + (draws * _band_sizes[clipped]).astype(np.int64)
+    choice[~in_band] = len(_all_gifts) - 1
+    return _all_gifts[choice]
+
+# Load the workshop's stock table: a CSV with Gift and Stock columns
+def load_stock(file_path):
+    stock = read_table(file_path)
+    return {gift: int(stock_count) for gift, stock_count in zip(stock['Gift'], stock['Stock'])}
+
+def _take_from_band(heap, stock):
+    """Pop the band gift with the most stock left, skipping stale heap entries."""
+    while heap:
+        negative_count, gift = heapq.heappop(heap)
+        remaining = stock.get(gift, 0)
+        if remaining <= 0:
+            continue
+        if -negative_count != remaining:
+            heapq.heappush(heap, (-remaining, gift))
+            continue
+        stock[gift] = remaining - 1
+        if remaining > 1:
+            heapq.heappush(heap, (1 - remaining, gift))
+        return gift
+    return None
+
+# Allocate gifts from finite stock, best loveometer scores first
+@instrumented
+def allocate_gifts(kids, stock, preference_column='Gift_Preference'):
+    """
+    Allocate gifts to kids from a finite {gift: count} stock table.
+
+    Kids are served from a priority queue in descending Final_Score order.
+    A kid gets their Gift_Preference while it is in stock, otherwise the
+    best-stocked gift of their loveometer band, falling back to lower bands
+    as bands run dry, and NO_GIFT when nothing is left. Each band is a heap
+    keyed on remaining stock, so the allocation runs in O(n log n).
+    Returns (gifts aligned with kids, Counter of unmet preferences per gift).
+    """
+    stock = dict(stock)
+    scores = kids['Final_Score'].to_numpy(dtype=np.float64)
+    preferences = kids[preference_column].tolist() if preference_column in kids.columns else [None] * len(kids)
+
+    band = np.searchsorted(_lower_edges, scores, side='right') - 1
+    top = (band == len(_bands) - 1) & (scores == _upper_edges[-1])
+    band[(band < 0) | ~((scores < _upper_edges[np.clip(band, 0, len(_bands) - 1)]) | top)] = -1
+
+    band_heaps = []
+    for _, band_gifts in _bands:
+        heap = [(-stock[gift], gift) for gift in set(band_gifts) if stock.get(gift, 0) > 0]
+        heapq.heapify(heap)
+        band_heaps.append(heap)
+
+    queue = [(-score if score == score else math.inf, position) for position, score in enumerate(scores)]
+    heapq.heapify(queue)
+    gifts = np.full(len(kids), NO_GIFT, dtype=object)
+    unmet = Counter()
+    while queue:
+        _, position = heapq.heappop(queue)
+        preference = preferences[position]
+        if isinstance(preference, str) and preference:
+            if stock.get(preference, 0) > 0:
+                stock[preference] -= 1
+                gifts[position] = preference
+                continue
+            unmet[preference] += 1
+        for b in range(band[position], -1, -1):
+            gift = _take_from_band(band_heaps[b], stock)
+            if gift is not None:
+                gifts[position] = gift
+                break
+    return gifts, unmet
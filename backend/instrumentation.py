@@ -0,0 +1,152 @@
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Setting this environment variable to a path turns metrics on for any script
+METRICS_ENV = 'SANTA_METRICS'
+
+# The running report, or None while instrumentation is off
+_run = None
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 2)
+
+class _Run:
+    def __init__(self, report_path, trace_memory):
+        self.report_path = report_path
+        self.trace_memory = trace_memory
+        self.started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = Counter()
+        # Open stages, innermost last: [name, start, child traced peak]
+        self.stack = []
+
+    def stage_entry(self, name):
+        return self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_rss_mb': None,
+                                             'traced_peak_mb': None, 'counters': Counter()})
+
+    def report(self):
+        stages = {}
+        for name, entry in self.stages.items():
+            stages[name] = dict(entry, seconds=round(entry['seconds'], 4), counters=dict(entry['counters']))
+        return {
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'argv': sys.argv[1:],
+            'started': self.started,
+            'total_seconds': round(time.perf_counter() - self.start, 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'counters': dict(self.counters),
+            'stages': dict(sorted(stages.items(), key=lambda item: -item[1]['seconds'])),
+        }
+
+def enable(report_path=None, trace_memory=False):
+    """
+    Turn metrics on for this process.
+
+    Stages and counters are collected from now on, and the JSON report is
+    written to report_path when the process exits (or by write_report).
+    trace_memory also records tracemalloc peaks per stage, which slows
+    allocation-heavy code down.
+    """
+    global _run
+    if _run is not None:
+        return
+    _run = _Run(report_path, trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if report_path:
+        atexit.register(write_report)
+
+def enabled():
+    return _run is not None
+
+class stage:
+    """
+    Time a block (`with stage('scoring'):`) or a function (`@stage('scoring')`).
+
+    Each stage records its calls, total seconds, the process peak RSS after
+    it and, with trace_memory, the largest tracemalloc peak inside it. Costs
+    one check per call while instrumentation is off.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _run is not None:
+            if _run.trace_memory:
+                tracemalloc.reset_peak()
+            _run.stack.append([self.name, time.perf_counter(), 0])
+        return self
+
+    def __exit__(self, *exc_info):
+        if _run is None or not _run.stack:
+            return False
+        name, start, child_peak = _run.stack.pop()
+        entry = _run.stage_entry(name)
+        entry['calls'] += 1
+        entry['seconds'] += time.perf_counter() - start
+        entry['peak_rss_mb'] = peak_rss_mb()
+        if _run.trace_memory:
+            # Inner stages reset the tracemalloc peak, so keep the largest peak they saw
+            peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+            entry['traced_peak_mb'] = max(entry['traced_peak_mb'] or 0, round(peak / 2 ** 20, 2))
+            if _run.stack:
+                _run.stack[-1][2] = max(_run.stack[-1][2], peak)
+        return False
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _run is None:
+                return function(*args, **kwargs)
+            with stage(self.name):
+                return function(*args, **kwargs)
+        return wrapper
+
+def instrumented(function):
+    """Decorator: record every call of the function as a stage named after it."""
+    return stage(function.__name__)(function)
+
+def count(name, n=1):
+    """Add n to a counter, in the run totals and in the innermost open stage."""
+    if _run is None:
+        return
+    _run.counters[name] += int(n)
+    if _run.stack:
+        _run.stage_entry(_run.stack[-1][0])['counters'][name] += int(n)
+
+def write_report(report_path=None):
+    """Write the JSON report of this run and return it."""
+    if _run is None:
+        return None
+    report = _run.report()
+    path = report_path or _run.report_path
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+    return report
+
+# Opt-in from the environment, for scripts without a --metrics option (not in worker processes,
+# which would overwrite the parent's report)
+if os.environ.get(METRICS_ENV) and multiprocessing.parent_process() is None:
+    enable(os.environ[METRICS_ENV], trace_memory=os.environ.get('SANTA_TRACE_MEMORY') == '1')
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# Kids returned per page unless asked otherwise, and the most a page may hold
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# Candidates checked per step when a substring filter has to look at the rows
+SCAN_BLOCK = 4096
+
+HASH_COLUMNS = ['Country', 'Good/Bad']
+SORTED_COLUMNS = ['Age', 'Final_Score']
+
+class KidIndex:
+    """
+    Indexed, paginated queries over the scored kid table.
+
+    Built once per table: hash indexes map each Country and Good/Bad value
+    (and each Child_ID) to row positions, and sorted indexes on Age and
+    Final_Score answer range filters with two binary searches. A query
+    intersects the position sets of its filters, so only matching rows are
+    touched; substring filters on Name and Gift are applied last, block by
+    block, and stop as soon as the page is full.
+
+    Pages are keyed by cursor: the Child_ID of the last kid returned. Results
+    come back in table order, so a cursor stays valid between requests.
+    """
+
+    def __init__(self, kids):
+        self.kids = kids.reset_index(drop=True)
+        self.size = len(self.kids)
+        self.positions = pd.Index(self.kids['Child_ID'])
+        self.hash_indexes = {
+            column: {key: np.sort(positions) for key, positions in self.kids.groupby(column).indices.items()}
+            for column in HASH_COLUMNS if column in self.kids
+        }
+        self.sorted_indexes = {}
+        for column in SORTED_COLUMNS:
+            if column in self.kids:
+                values = self.kids[column].to_numpy()
+                order = np.argsort(values, kind='stable')
+                self.sorted_indexes[column] = (values[order], order)
+        self.lowercase = {
+            column: self.kids[column].astype(str).str.lower().to_numpy(dtype=object)
+            for column in ('Name', 'Gift') if column in self.kids
+        }
+
+    def position(self, child_id):
+        """Row position of a kid, or None when the id is unknown."""
+        location = self.positions.get_indexer([child_id])[0]
+        return None if location < 0 else int(location)
+
+    def get(self, child_id):
+        position = self.position(child_id)
+        return None if position is None else self.kids.iloc[position]
+
+    def lookup(self, column, value):
+        """Sorted row positions whose column equals value."""
+        return self.hash_indexes[column].get(value, np.empty(0, dtype=np.intp))
+
+    def range(self, column, low=None, high=None):
+        """Sorted row positions with low <= column <= high."""
+        values, order = self.sorted_indexes[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return np.sort(order[start:stop])
+
+    def candidates(self, country=None, good_bad=None, child_ids=None, min_age=None, max_age=None,
+                   min_score=None, max_score=None):
+        """Sorted positions matching every indexed filter (all rows when there are none)."""
+        sets = []
+        if country is not None:
+            sets.append(self.lookup('Country', country))
+        if good_bad is not None:
+            sets.append(self.lookup('Good/Bad', good_bad))
+        if child_ids is not None:
+            locations = self.positions.get_indexer(list(child_ids))
+            sets.append(np.unique(locations[locations >= 0]))
+        if min_age is not None or max_age is not None:
+            sets.append(self.range('Age', min_age, max_age))
+        if min_score is not None or max_score is not None:
+            sets.append(self.range('Final_Score', min_score, max_score))
+        if not sets:
+            return np.arange(self.size)
+        # Intersect smallest first so every step works on the fewest positions
+        sets.sort(key=len)
+        result = sets[0]
+        for positions in sets[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, positions, assume_unique=True)
+        return result
+
+    def query(self, name=None, gift=None, cursor=None, limit=DEFAULT_PAGE_SIZE, **filters):
+        """
+        Return (page, next_cursor) for the kids matching all filters.
+
+        filters are the keyword arguments of candidates(); name and gift are
+        case-insensitive substring matches. next_cursor is None on the last page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        positions = self.candidates(**filters)
+        if cursor is not None:
+            after = self.position(cursor)
+            if after is None:
+                raise KeyError(f"Unknown cursor {cursor}")
+            positions = positions[np.searchsorted(positions, after, side='right'):]
+
+        substrings = [(self.lowercase[column], text.lower())
+                      for column, text in (('Name', name), ('Gift', gift)) if text]
+        if substrings:
+            matches, start, found = [], 0, 0
+            while found <= limit and start < len(positions):
+                block = positions[start:start + SCAN_BLOCK]
+                mask = np.ones(len(block), dtype=bool)
+                for values, text in substrings:
+                    mask &= np.fromiter((text in value for value in values[block]), dtype=bool, count=len(block))
+                matches.append(block[mask])
+                found += int(mask.sum())
+                start += SCAN_BLOCK
+            positions = np.concatenate(matches) if matches else positions[:0]
+
+        page = self.kids.iloc[positions[:limit]]
+        next_cursor = page['Child_ID'].iloc[-1].item() if len(positions) > limit else None
+        return page, next_cursor
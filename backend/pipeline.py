@@ -0,0 +1,203 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Hashes of the inputs and outputs of the last successful run of each stage
+STATE_PATH = os.path.join('.cache', 'pipeline.json')
+
+# Output of each stage's last run
+LOG_DIR = os.path.join('.cache', 'logs')
+
+# The script and every backend module it imports, directly or through other backend modules
+def local_modules(script, directory='.'):
+    found = set()
+    pending = [script]
+    while pending:
+        path = pending.pop()
+        if path in found or not os.path.exists(os.path.join(directory, path)):
+            continue
+        found.add(path)
+        with open(os.path.join(directory, path), 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        # Imports anywhere in the file count, including the ones inside functions
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                names = [node.module]
+            else:
+                continue
+            pending.extend(f"{name.split('.')[0]}.py" for name in names)
+    return sorted(found)
+
+class Stage:
+    """
+    A script run with its declared data inputs and output files.
+
+    The script and the backend modules it imports are inputs too; they are
+    found by scanning the imports, so a module edit always makes the stage
+    stale.
+    """
+
+    def __init__(self, name, command, data_inputs, outputs=()):
+        self.name = name
+        self.command = command
+        self.data_inputs = list(data_inputs)
+        self.outputs = list(outputs)
+
+    @property
+    def inputs(self):
+        return self.data_inputs + local_modules(self.command[0])
+
+# The backend, in dependency order. Stages reading the same files without writing each other's
+# inputs are independent and run side by side.
+STAGES = [
+    Stage('scores', ['scoring.py', 'santa.csv'], ['santa.csv', 'AFINN-111.txt']),
+    Stage('horn', ['Horn_probability_finished.py'], ['santa.csv'], ['updated_santa.csv']),
+    Stage('routes', ['djikstra.py'], ['updated_santa.csv', 'AFINN-111.txt'], ['good_path.json', 'bad_path.json']),
+    Stage('categories', ['Categorize.py'], ['santa.csv'], ['categorized_gifts.csv']),
+    Stage('gifts', ['bogdan.py'], ['santa.csv', 'AFINN-111.txt'], ['santa_gift_results.csv']),
+    Stage('good_bad', ['bogda2n.py'], ['santa.csv', 'AFINN-111.txt'], ['good_kids_results.csv', 'bad_kids_results.csv']),
+]
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def input_hash(stage):
+    """Hash of the stage's command and the contents of all of its inputs."""
+    digest = hashlib.sha256(json.dumps(stage.command).encode())
+    for path in stage.inputs:
+        digest.update(path.encode())
+        digest.update(file_hash(path).encode() if os.path.exists(path) else b'missing')
+    return digest.hexdigest()
+
+def dependencies(stages):
+    """{stage name: names of the stages producing one of its inputs}."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    depends = {}
+    for stage in stages:
+        depends[stage.name] = {producers[path] for path in stage.inputs if path in producers}
+        # Stages scoring santa.csv share the score cache, so let the scores stage fill it first
+        if stage.name != 'scores' and 'scoring.py' in stage.inputs and 'santa.csv' in stage.inputs:
+            depends[stage.name].add('scores')
+    return depends
+
+def is_stale(stage, state, inputs):
+    """A stage is stale when its inputs changed or an output is missing or was changed since it ran."""
+    previous = state.get(stage.name)
+    if not previous or previous['inputs'] != inputs:
+        return True
+    return any(not os.path.exists(path) or previous['outputs'].get(path) != file_hash(path)
+               for path in stage.outputs)
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=4)
+
+def run_stage(stage):
+    """Run one stage in its own process, logging its output; returns (return code, seconds)."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(LOG_DIR, f"{stage.name}.log"), 'w', encoding='utf-8') as log:
+        returncode = subprocess.call([sys.executable] + stage.command, stdout=log, stderr=subprocess.STDOUT)
+    return returncode, time.perf_counter() - start
+
+def run_pipeline(stages=STAGES, selected=None, force=False, jobs=None, dry_run=False):
+    """
+    Run the stale stages, each as soon as the stages it depends on are done.
+
+    selected limits the run to those stages and everything they depend on.
+    A stage is skipped when the hash of its inputs matches the last
+    successful run and its outputs are untouched; its dependents are still
+    checked, since an upstream rerun may leave its outputs unchanged.
+    Returns {stage name: (status, seconds)}.
+    """
+    depends = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    wanted = set(by_name) if not selected else set()
+    pending = list(selected or [])
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(depends[name])
+
+    state = load_state()
+    results = {}
+    waiting = [stage for stage in stages if stage.name in wanted]
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while waiting or running:
+            for stage in list(waiting):
+                if any(dep in wanted and dep not in results for dep in depends[stage.name]):
+                    continue
+                waiting.remove(stage)
+                if any(results[dep][0] in ('failed', 'blocked') for dep in depends[stage.name] if dep in results):
+                    results[stage.name] = ('blocked', 0.0)
+                    continue
+                inputs = input_hash(stage)
+                if not force and not is_stale(stage, state, inputs):
+                    results[stage.name] = ('cached', 0.0)
+                elif dry_run:
+                    results[stage.name] = ('stale', 0.0)
+                else:
+                    print(f"Running {stage.name}: {' '.join(stage.command)}")
+                    running[pool.submit(run_stage, stage)] = (stage, inputs)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, inputs = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    state[stage.name] = {'inputs': inputs,
+                                         'outputs': {path: file_hash(path) for path in stage.outputs
+                                                     if os.path.exists(path)}}
+                    save_state(state)
+                    results[stage.name] = ('ran', seconds)
+                else:
+                    print(f"{stage.name} failed (exit code {returncode}), see {os.path.join(LOG_DIR, stage.name)}.log")
+                    results[stage.name] = ('failed', seconds)
+    return results
+
+def print_summary(results, total_seconds):
+    print(f"\n{'Stage':<12} {'Status':<8} {'Seconds':>8}")
+    for name, (status, seconds) in results.items():
+        print(f"{name:<12} {status:<8} {seconds:>8.2f}")
+    print(f"{'Total':<21} {total_seconds:>8.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the backend stages that are out of date.")
+    parser.add_argument('stages', nargs='*', help="Only these stages and the stages they depend on.")
+    parser.add_argument('--force', action='store_true', help="Run every selected stage, even when up to date.")
+    parser.add_argument('--jobs', type=int, default=None, help="Stages run at the same time (defaults to every core).")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the stale stages.")
+    args = parser.parse_args(argv)
+    unknown = set(args.stages) - {stage.name for stage in STAGES}
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    results = run_pipeline(selected=args.stages, force=args.force, jobs=args.jobs, dry_run=args.dry_run)
+    print_summary(results, time.perf_counter() - start)
+    return 1 if any(status in ('failed', 'blocked') for status, _ in results.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
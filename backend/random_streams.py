@@ -0,0 +1,68 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Seed used by every stage unless a run sets its own
+RUN_SEED = 42
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+def splitmix64(values):
+    """SplitMix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    with np.errstate(over='ignore'):
+        z = np.asarray(values, dtype=np.uint64) + _GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * _MIX_1
+        z = (z ^ (z >> np.uint64(27))) * _MIX_2
+        return z ^ (z >> np.uint64(31))
+
+def purpose_key(purpose):
+    """Stable 64-bit key of a purpose name such as 'gift' or 'horn'."""
+    return np.uint64(int.from_bytes(hashlib.sha256(purpose.encode()).digest()[:8], 'little'))
+
+def as_keys(child_ids):
+    """
+    uint64 keys of Child_IDs: integers (also as text, e.g. straight from a
+    CSV, or as whole floats) as they are, anything else hashed.
+    """
+    values = np.asarray(child_ids)
+    if values.dtype.kind in 'iub':
+        return values.astype(np.uint64)
+    try:
+        integers = values.astype(np.int64)
+        if values.dtype.kind != 'f' or np.array_equal(integers, values):
+            return integers.astype(np.uint64)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return pd.util.hash_array(values.astype(str).astype(object))
+
+def random_bits(seed, child_ids, purpose, counter=0):
+    """
+    64 random bits per (seed, Child_ID, purpose, counter).
+
+    Counter-based: every value is a hash of its key, not the next state of a
+    generator, so a kid gets the same draws whatever the row order, chunk
+    size, shard or process it is handled in. counter numbers the draws of
+    one kid (e.g. the samples of a simulation) and broadcasts with child_ids.
+    """
+    base = splitmix64(np.uint64(seed) ^ purpose_key(purpose))
+    stream = splitmix64(base ^ as_keys(child_ids))
+    return splitmix64(stream ^ splitmix64(np.asarray(counter, dtype=np.uint64)))
+
+def uniform(seed, child_ids, purpose, low=0.0, high=1.0, counter=0):
+    """Uniform floats in [low, high) from the keyed streams."""
+    unit = (random_bits(seed, child_ids, purpose, counter) >> np.uint64(11)) * (1.0 / (1 << 53))
+    return low + (high - low) * unit
+
+def sample_positions(child_ids, n, seed=RUN_SEED, purpose='sample'):
+    """
+    Positions of n kids picked at random, in table order.
+
+    Each kid gets a keyed random number and the n smallest win, so a kid's
+    selection does not depend on which other rows are in the table or in
+    what order they come.
+    """
+    draws = random_bits(seed, child_ids, purpose)
+    n = min(int(n), len(draws))
+    return np.sort(np.argsort(draws, kind='stable')[:n])
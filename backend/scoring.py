@@ -0,0 +1,457 @@
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+from columnar import fill_text, read_table, write_table
+from instrumentation import count, enable, instrumented
+
+# Load AFINN sentiment scores
+def load_afinn(file_path='AFINN-111.txt'):
+    if not os.path.exists(file_path):
+        print(f"AFINN file not found at path: {file_path}")
+        sys.exit(1)
+    afinn = {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word, score = line.strip().split('\t')
+            afinn[word] = int(score)
+    return afinn
+
+class DeedScorer:
+    """
+    Sentiment scorer for Good_Deed / Bad_Deed text.
+
+    Every AFINN entry, including multi-word phrases such as "does not work",
+    is compiled into one regex alternation tried longest-first, so a deed is
+    scored in a single pass without a tokenizer. Each distinct deed string is
+    scored once and remembered.
+    """
+
+    def __init__(self, afinn):
+        self.afinn = afinn
+        phrases = sorted(afinn, key=len, reverse=True)
+        self._pattern = re.compile(r"(?<![\w-])(?:" + "|".join(map(re.escape, phrases)) + r")(?![\w-])")
+        self._cache = {}
+
+    def score(self, text):
+        if not isinstance(text, str):
+            return 0  # Neutral score for invalid input
+        score = self._cache.get(text)
+        if score is None:
+            score = sum(self.afinn[match.group()] for match in self._pattern.finditer(text.lower()))
+            self._cache[text] = score
+        return score
+
+    def score_series(self, deeds):
+        """Score a column of deeds, scoring each distinct value only once."""
+        codes, uniques = pd.factorize(deeds)
+        count('distinct_deeds', len(uniques))
+        # Missing deeds get code -1, which picks the trailing neutral score
+        scores = np.array([self.score(deed) for deed in uniques] + [0], dtype=np.int64)
+        return pd.Series(scores[codes], index=deeds.index)
+
+# Bump whenever the scoring formula changes so stale caches are ignored
+SCORING_VERSION = 1
+
+SCORE_COLUMNS = ['Good_Score', 'Bad_Score', 'Total_Score', 'Normalized_Score',
+                 'Grade_Component', 'Listen_Component', 'Final_Score', 'Good/Bad']
+
+# Exact, order-independent sum of float values
+def exact_sum(values):
+    """
+    Sum float values exactly and return the result as a Fraction.
+
+    Each value is split into an integer mantissa and a power of two, and the
+    mantissas are summed per exponent in int64, so the result does not depend
+    on row order or on how the rows were split into batches. NaNs are skipped.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mantissa, exponent = np.frexp(values[~np.isnan(values)])
+    ints = (mantissa * 2.0 ** 53).astype(np.int64)
+    total = Fraction(0)
+    for e in np.unique(exponent):
+        group = ints[exponent == e]
+        # Split into 26/27-bit halves so the int64 sums cannot overflow
+        mantissa_sum = (int(np.sum(group >> 26)) << 26) + int(np.sum(group & ((1 << 26) - 1)))
+        shift = int(e) - 53
+        total += Fraction(mantissa_sum << shift) if shift >= 0 else Fraction(mantissa_sum, 1 << -shift)
+    return total
+
+def _max(*values):
+    values = [v for v in values if not math.isnan(v)]
+    return max(values) if values else float('nan')
+
+# Global aggregates the normalization depends on
+def compute_score_stats(good_raw, bad_raw, grades, listened):
+    """
+    Return the global statistics Final_Score is normalized against.
+
+    Inputs are the raw AFINN deed scores and the unfilled School_Grades /
+    Listened_To_Parents columns. Sums are exact Fractions, so statistics of
+    separate batches can be combined with merge_score_stats without any
+    rounding drift.
+    """
+    combined = good_raw + bad_raw
+    return {
+        'count': int(len(good_raw)),
+        'good_min': int(good_raw.min()),
+        'combined_min': int(combined.min()),
+        'combined_max': int(combined.max()),
+        'grades_sum': exact_sum(grades),
+        'grades_count': int(grades.count()),
+        'grades_max': float(grades.max()),
+        'listened_sum': exact_sum(listened),
+        'listened_count': int(listened.count()),
+        'listened_max': float(listened.max()),
+    }
+
+# Combine the statistics of several batches of kids
+def merge_score_stats(*parts):
+    return {
+        'count': sum(p['count'] for p in parts),
+        'good_min': min(p['good_min'] for p in parts),
+        'combined_min': min(p['combined_min'] for p in parts),
+        'combined_max': max(p['combined_max'] for p in parts),
+        'grades_sum': sum((p['grades_sum'] for p in parts), Fraction(0)),
+        'grades_count': sum(p['grades_count'] for p in parts),
+        'grades_max': _max(*(p['grades_max'] for p in parts)),
+        'listened_sum': sum((p['listened_sum'] for p in parts), Fraction(0)),
+        'listened_count': sum(p['listened_count'] for p in parts),
+        'listened_max': _max(*(p['listened_max'] for p in parts)),
+    }
+
+# Normalize raw scores against the global statistics
+def apply_score_stats(data, good_raw, bad_raw, stats):
+    good_offset = abs(stats['good_min']) + 1
+    total_offset = abs(stats['combined_min'] + good_offset)
+    max_total = stats['combined_max'] + good_offset + total_offset
+
+    data['School_Grades'] = data['School_Grades'].fillna(float(stats['grades_sum']) / stats['grades_count'])
+    data['Listened_To_Parents'] = data['Listened_To_Parents'].fillna(
+        float(stats['listened_sum']) / stats['listened_count'])
+
+    data['Good_Score'] = good_raw + good_offset
+    data['Bad_Score'] = bad_raw
+    data['Total_Score'] = data['Good_Score'] + data['Bad_Score'] + total_offset
+    data['Normalized_Score'] = data['Total_Score'] / (3 * max_total)
+    data['Grade_Component'] = data['School_Grades'] / (3 * stats['grades_max'])
+    data['Listen_Component'] = data['Listened_To_Parents'] / (3 * stats['listened_max'])
+    data['Final_Score'] = data['Normalized_Score'] + data['Grade_Component'] + data['Listen_Component']
+    return data
+
+# Label kids against the average Final_Score
+def label_good_bad(data, average_rating=None):
+    if average_rating is None:
+        average_rating = float(exact_sum(data['Final_Score'])) / len(data)
+    # Taking from a two-label column skips validating a million new strings
+    good = (data['Final_Score'] >= average_rating).to_numpy(dtype=np.int64)
+    data['Good/Bad'] = pd.Series(['Bad', 'Good']).take(good).array
+    return average_rating
+
+# Copy of the kid table with numeric grades and no missing deeds
+def coerce_kids(data):
+    data = data.copy()
+    data['Listened_To_Parents'] = pd.to_numeric(data['Listened_To_Parents'], errors='coerce')
+    data['School_Grades'] = pd.to_numeric(data['School_Grades'], errors='coerce')
+    data['Good_Deed'] = fill_text(data['Good_Deed'])
+    data['Bad_Deed'] = fill_text(data['Bad_Deed'])
+    return data
+
+# Coerce the input columns and compute the raw (unnormalized) deed scores
+def prepare_kids(data, scorer):
+    data = coerce_kids(data)
+    good_raw = scorer.score_series(data['Good_Deed'])
+    bad_raw = scorer.score_series(data['Bad_Deed'])
+    return data, good_raw, bad_raw
+
+# Score every kid: deed scores, normalized components, Final_Score and Good/Bad
+@instrumented
+def score_kids(data, scorer, workers=1):
+    count('rows_scored', len(data))
+    if workers != 1 and len(data) >= SHARD_MIN_ROWS:
+        return score_kids_sharded(data, scorer, workers)
+    data, good_raw, bad_raw = prepare_kids(data, scorer)
+    stats = compute_score_stats(good_raw, bad_raw, data['School_Grades'], data['Listened_To_Parents'])
+    apply_score_stats(data, good_raw, bad_raw, stats)
+    label_good_bad(data)
+    return data
+
+# Tables smaller than this are scored in one process even when workers are allowed
+SHARD_MIN_ROWS = 200_000
+
+# Columns the shards fill in, in shared memory, with the dtype of their buffer
+SHARD_COLUMNS = [('School_Grades', 'd'), ('Listened_To_Parents', 'd')] + \
+                [(column, 'q' if column in ('Good_Score', 'Bad_Score', 'Total_Score') else 'd')
+                 for column in SCORE_COLUMNS[:-1]]
+
+_shard_scorer = None
+_shard_data = None
+_shard_arrays = None
+
+def _shared_arrays(buffers):
+    return {column: np.frombuffer(buffer, dtype=np.int64 if code == 'q' else np.float64)
+            for (column, code), buffer in zip(SHARD_COLUMNS, buffers)}
+
+def _init_shard_worker(afinn, data, buffers):
+    global _shard_scorer, _shard_data, _shard_arrays
+    _shard_scorer = DeedScorer(afinn)
+    _shard_data = data
+    _shard_arrays = _shared_arrays(buffers)
+
+# Map step: coerce and score the deeds of rows start:stop (runs in a worker process)
+def score_shard(start, stop):
+    """
+    Store the raw deed scores and coerced numbers of the rows. Returns the
+    coerced dtypes, the positions of missing deeds and partial statistics.
+    """
+    rows = _shard_data.iloc[start:stop][['Good_Deed', 'Bad_Deed', 'School_Grades', 'Listened_To_Parents']]
+    missing = {column: start + np.flatnonzero(rows[column].isna().to_numpy()) for column in ('Good_Deed', 'Bad_Deed')}
+    shard = coerce_kids(rows)
+    good_raw = _shard_scorer.score_series(shard['Good_Deed'])
+    bad_raw = _shard_scorer.score_series(shard['Bad_Deed'])
+    # Raw scores wait in the Good_Score / Bad_Score buffers until normalize_shard
+    _shard_arrays['Good_Score'][start:stop] = good_raw
+    _shard_arrays['Bad_Score'][start:stop] = bad_raw
+    dtypes = {}
+    for column in ('School_Grades', 'Listened_To_Parents'):
+        _shard_arrays[column][start:stop] = shard[column]
+        dtypes[column] = shard[column].dtype
+    return dtypes, missing, compute_score_stats(good_raw, bad_raw, shard['School_Grades'], shard['Listened_To_Parents'])
+
+# Second map step: normalize rows start:stop against the merged statistics (runs in a worker process)
+def normalize_shard(start, stop, stats):
+    """Store the score columns of the rows and return the exact sum of their Final_Score."""
+    shard = pd.DataFrame({column: _shard_arrays[column][start:stop]
+                          for column in ('School_Grades', 'Listened_To_Parents')})
+    apply_score_stats(shard, pd.Series(_shard_arrays['Good_Score'][start:stop]),
+                      pd.Series(_shard_arrays['Bad_Score'][start:stop]), stats)
+    for column, _ in SHARD_COLUMNS:
+        _shard_arrays[column][start:stop] = shard[column]
+    return exact_sum(shard['Final_Score'])
+
+@instrumented
+def score_kids_sharded(data, scorer, workers=None, shards=None):
+    """
+    score_kids spread over a process pool, with bit-identical results.
+
+    The table is split into row ranges. In a first map each worker slices
+    and coerces its range, scores its deeds and computes its partial
+    statistics (exact Fraction sums, mins and maxes); the parent merges
+    them with merge_score_stats. A second map normalizes every range
+    against the merged statistics and returns the exact sum of its
+    Final_Score, which gives the Good/Bad threshold. Workers write their
+    columns into shared memory and get the table at start-up (inherited
+    without a copy where processes fork), so the parent only fills the
+    deed text, labels and assembles the result. Mins, maxes and exact sums
+    do not depend on how the rows were split, so every value matches
+    score_kids.
+    """
+    workers = workers or os.cpu_count() or 1
+    n = len(data)
+    bounds = np.linspace(0, n, (shards or workers) + 1).astype(int)
+    ranges = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    buffers = [multiprocessing.RawArray(code, max(n, 1)) for _, code in SHARD_COLUMNS]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker,
+                             initargs=(scorer.afinn, data, buffers)) as pool:
+        results = list(pool.map(score_shard, *zip(*ranges)))
+        stats = merge_score_stats(*(stats for _, _, stats in results))
+        final_sum = sum(pool.map(normalize_shard, *zip(*ranges), [stats] * len(ranges)), Fraction(0))
+
+    # Reduce: the shared columns already hold every row, in table order
+    arrays = {column: values[:n] for column, values in _shared_arrays(buffers).items()}
+    scored = data.copy(deep=False)
+    for column in ('School_Grades', 'Listened_To_Parents'):
+        dtype = np.result_type(*(dtypes[column] for dtypes, _, _ in results))
+        scored[column] = arrays[column].astype(dtype, copy=False)
+    for column in ('Good_Deed', 'Bad_Deed'):
+        missing = np.concatenate([missing[column] for _, missing, _ in results])
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            scored[column] = fill_text(data[column])
+        elif len(missing):
+            # The workers found the gaps, so fill them without another scan of the column
+            deeds = data[column].array.copy()
+            deeds[missing] = ''
+            scored[column] = deeds
+    for column in SCORE_COLUMNS[:-1]:
+        scored[column] = arrays[column]
+    label_good_bad(scored, float(final_sum) / n)
+    return scored
+
+# Content hash of the files a cached result depends on
+def file_digest(*paths):
+    digest = hashlib.sha256(f"scoring-v{SCORING_VERSION}".encode())
+    for path in paths:
+        # A column store directory is hashed file by file
+        files = [path] if not os.path.isdir(path) else [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        for file_path in files:
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+def scored_cache_path(data_path, afinn_path, cache_dir='.cache'):
+    return os.path.join(cache_dir, f"scores-{file_digest(data_path, afinn_path)[:16]}.pkl")
+
+# Load the scored kid table, computing it only when the inputs changed
+@instrumented
+def load_scored_kids(data_path='santa.csv', afinn_path='AFINN-111.txt', cache_dir='.cache', read=read_table,
+                     workers=1):
+    """
+    Return the kid table with the SCORE_COLUMNS added.
+
+    The result is cached in cache_dir under a hash of the kid file, the AFINN
+    file and SCORING_VERSION, so later stages reuse it until one of those
+    changes. `read` loads the kid file (CSV, Parquet, Feather or a column
+    store) on a cache miss, and workers > 1 (or None for every core) scores
+    large tables with score_kids_sharded.
+    """
+    if not os.path.exists(data_path):
+        print(f"Data file not found at path: {data_path}")
+        sys.exit(1)
+    cache_path = scored_cache_path(data_path, afinn_path, cache_dir)
+    if os.path.exists(cache_path):
+        count('score_cache_hits')
+        return pd.read_pickle(cache_path)
+
+    scored = score_kids(read(data_path), DeedScorer(load_afinn(afinn_path)), workers)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write then rename, so a process reading the cache never sees half a file
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    scored.to_pickle(temp_path)
+    os.replace(temp_path, cache_path)
+    return scored
+
+# Extremes that force every kid to be renormalized when they move
+EXTREME_STATS = ['good_min', 'combined_min', 'combined_max', 'grades_max', 'listened_max']
+
+def _score_rows(table, mask, stats):
+    """Renormalize the rows selected by mask from their raw columns."""
+    rows = table.loc[mask].copy()
+    rows.loc[rows['Grades_Missing'], 'School_Grades'] = np.nan
+    rows.loc[rows['Listened_Missing'], 'Listened_To_Parents'] = np.nan
+    apply_score_stats(rows, rows['Good_Raw'], rows['Bad_Raw'], stats)
+    for column in ['School_Grades', 'Listened_To_Parents'] + SCORE_COLUMNS[:-1]:
+        table.loc[mask, column] = rows[column]
+
+# Score only the kids appended since the last run
+@instrumented
+def update_scores(data_path='santa.csv', afinn_path='AFINN-111.txt', state_dir=os.path.join('.cache', 'incremental'),
+                  cache_dir='.cache'):
+    """
+    Incrementally rescore an append-only kid list.
+
+    The state directory keeps the scored table (with raw deed scores and the
+    missing-value masks) and the running aggregates. New Child_IDs are scored
+    and merged into the aggregates; every kid is renormalized only when one
+    of the EXTREME_STATS moved, otherwise just the new kids and the kids
+    whose grades were filled with the (shifted) means. Returns the scored
+    table and the Child_IDs whose Good/Bad label flipped. The table (input
+    columns plus SCORE_COLUMNS) is also stored where load_scored_kids looks
+    for it, so later stages hit the cache. Falls back to a full rescore when
+    kids were removed, AFINN changed, or the state was built from another
+    data file or another set of columns.
+    """
+    state_path = os.path.join(state_dir, 'state.json')
+    table_path = os.path.join(state_dir, 'scores.pkl')
+    afinn_digest = file_digest(afinn_path)
+    scorer = DeedScorer(load_afinn(afinn_path))
+    data = read_table(data_path)
+    source = {'data_path': os.path.abspath(data_path), 'columns': list(data.columns)}
+
+    state = None
+    if os.path.exists(state_path) and os.path.exists(table_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if (state.get('afinn_digest') != afinn_digest or state.get('data_path') != source['data_path']
+                or state.get('columns') != source['columns']):
+            state = None
+    if state is not None:
+        table = pd.read_pickle(table_path)
+        if not table['Child_ID'].isin(data['Child_ID']).all():
+            state = None
+
+    flipped = []
+    if state is None:
+        # Full score, keeping the raw columns needed for later updates
+        table, good_raw, bad_raw = prepare_kids(data, scorer)
+        table['Good_Raw'], table['Bad_Raw'] = good_raw, bad_raw
+        table['Grades_Missing'] = table['School_Grades'].isna()
+        table['Listened_Missing'] = table['Listened_To_Parents'].isna()
+        stats = compute_score_stats(good_raw, bad_raw, table['School_Grades'], table['Listened_To_Parents'])
+        apply_score_stats(table, good_raw, bad_raw, stats)
+        final_sum = exact_sum(table['Final_Score'])
+        label_good_bad(table, float(final_sum) / len(table))
+        print(f"Scored all {len(table)} kids")
+    else:
+        old_stats = {key: Fraction(value) if key.endswith('_sum') else value for key, value in state['stats'].items()}
+        final_sum = Fraction(state['final_sum'])
+        new, good_raw, bad_raw = prepare_kids(data[~data['Child_ID'].isin(table['Child_ID'])], scorer)
+        new['Good_Raw'], new['Bad_Raw'] = good_raw, bad_raw
+        new['Grades_Missing'] = new['School_Grades'].isna()
+        new['Listened_Missing'] = new['Listened_To_Parents'].isna()
+        stats = old_stats
+        if len(new):
+            stats = merge_score_stats(
+                old_stats, compute_score_stats(good_raw, bad_raw, new['School_Grades'], new['Listened_To_Parents']))
+        old_labels = table['Good/Bad'].copy()
+        table = pd.concat([table, new], ignore_index=True)
+
+        if any(stats[key] != old_stats[key] for key in EXTREME_STATS):
+            _score_rows(table, np.ones(len(table), dtype=bool), stats)
+            final_sum = exact_sum(table['Final_Score'])
+            print(f"Scored {len(new)} new kids, renormalized all {len(table)}")
+        elif len(new):
+            # Only new kids and kids filled with the (shifted) means change
+            mask = np.zeros(len(table), dtype=bool)
+            mask[len(old_labels):] = True
+            mask |= table['Grades_Missing'].to_numpy() | table['Listened_Missing'].to_numpy()
+            old_mask = mask[:len(old_labels)]
+            final_sum -= exact_sum(table.loc[:len(old_labels) - 1, 'Final_Score'][old_mask])
+            _score_rows(table, mask, stats)
+            final_sum += exact_sum(table.loc[mask, 'Final_Score'])
+            print(f"Scored {len(new)} new kids, renormalized {int(mask.sum())}")
+        label_good_bad(table, float(final_sum) / len(table))
+        changed = table['Good/Bad'].iloc[:len(old_labels)].to_numpy() != old_labels.to_numpy()
+        flipped = table.loc[:len(old_labels) - 1, 'Child_ID'][changed].tolist()
+        if flipped:
+            print(f"{len(flipped)} kids changed Good/Bad label")
+
+    os.makedirs(state_dir, exist_ok=True)
+    table.to_pickle(table_path)
+    serializable = {key: str(value) if key.endswith('_sum') else value for key, value in stats.items()}
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(source, afinn_digest=afinn_digest, stats=serializable, final_sum=str(final_sum)), f, indent=4)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Same columns as load_scored_kids would produce, without the incremental bookkeeping
+    table[source['columns'] + SCORE_COLUMNS].to_pickle(scored_cache_path(data_path, afinn_path, cache_dir))
+    return table, flipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the kid list and cache the result for the later stages.")
+    parser.add_argument('data_path', nargs='?', default='santa.csv')
+    parser.add_argument('--afinn', default='AFINN-111.txt')
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only score Child_IDs appended since the last incremental run.")
+    parser.add_argument('--output', help="Also save the scored table (.csv, .parquet, .feather or .cols).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes used to score large lists (0 uses every core).")
+    parser.add_argument('--metrics', metavar='PATH', help="Write a JSON report of stage timings and counters to PATH.")
+    args = parser.parse_args()
+    if args.metrics:
+        enable(args.metrics)
+    if args.incremental:
+        scored, _ = update_scores(args.data_path, args.afinn)
+    else:
+        scored = load_scored_kids(args.data_path, args.afinn, workers=args.workers or None)
+        print(f"Scored {len(scored)} kids")
+    if args.output:
+        write_table(scored, args.output)
+        print(f"Scored kids saved to {args.output}")
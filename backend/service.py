@@ -0,0 +1,129 @@
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel
+from scoring import DeedScorer, load_afinn, load_scored_kids
+from gifts import assign_gifts
+from categorizer import categorize_gifts, load_or_train_model
+from djikstra import solve_cluster
+from kid_query import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, KidIndex
+
+DATA_PATH = os.environ.get("SANTA_DATA", "santa.csv")
+AFINN_PATH = os.environ.get("SANTA_AFINN", "AFINN-111.txt")
+ROUTE_WORKERS = int(os.environ.get("SANTA_ROUTE_WORKERS", "0")) or None
+
+# Routes kept for repeated queries
+ROUTE_CACHE_SIZE = 128
+
+KID_FIELDS = ["Child_ID", "Name", "Age", "Country", "Gift_Preference", "Final_Score", "Good/Bad", "Gift", "Category"]
+
+# Everything loaded once at startup
+state = {}
+
+@asynccontextmanager
+async def lifespan(app):
+    state["scorer"] = DeedScorer(load_afinn(AFINN_PATH))
+    kids = load_scored_kids(DATA_PATH, AFINN_PATH)
+    kids["Gift"] = assign_gifts(kids["Final_Score"], child_ids=kids["Child_ID"])
+    kids["Category"] = categorize_gifts(kids["Gift_Preference"], load_or_train_model())
+    state["kids"] = kids.set_index("Child_ID", drop=False)
+    state["index"] = KidIndex(kids)
+    state["routes"] = OrderedDict()
+    state["pool"] = ProcessPoolExecutor(max_workers=ROUTE_WORKERS)
+    yield
+    state["pool"].shutdown(cancel_futures=True)
+
+app = FastAPI(title="Santa scoring and routing service", lifespan=lifespan)
+
+class DeedRequest(BaseModel):
+    text: str
+
+class RouteRequest(BaseModel):
+    child_ids: List[int]
+    improve_seconds: float = 0
+    improve_iterations: Optional[int] = None
+
+def to_python(value):
+    return value.item() if hasattr(value, "item") else value
+
+@app.post("/score-deed")
+async def score_deed(request: DeedRequest):
+    return {"text": request.text, "score": state["scorer"].score(request.text)}
+
+@app.get("/kids")
+async def list_kids(country: Optional[str] = None, good_bad: Optional[str] = None,
+                    min_age: Optional[int] = None, max_age: Optional[int] = None,
+                    min_score: Optional[float] = None, max_score: Optional[float] = None,
+                    name: Optional[str] = None, gift: Optional[str] = None, cursor: Optional[int] = None,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """One page of kids matching every given filter, plus the cursor for the next page."""
+    try:
+        page, next_cursor = state["index"].query(
+            name=name, gift=gift, cursor=cursor, limit=limit, country=country, good_bad=good_bad,
+            min_age=min_age, max_age=max_age, min_score=min_score, max_score=max_score)
+    except KeyError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    kids = [{field: to_python(value) for field, value in zip(KID_FIELDS, row)}
+            for row in page[KID_FIELDS].itertuples(index=False)]
+    return {"kids": kids, "next_cursor": next_cursor}
+
+@app.get("/kids/{child_id}")
+async def get_kid(child_id: int):
+    kids = state["kids"]
+    if child_id not in kids.index:
+        raise HTTPException(status_code=404, detail=f"Kid {child_id} not found")
+    row = kids.loc[child_id]
+    return {field: to_python(row[field]) for field in KID_FIELDS}
+
+@app.post("/route")
+async def route(request: RouteRequest):
+    """
+    Route Santa through a subset of kids.
+
+    The tour is solved in the process pool so the event loop stays free, and
+    identical requests share one cached (or in-flight) result.
+    """
+    kids = state["kids"]
+    child_ids = sorted(set(request.child_ids))
+    missing = [child_id for child_id in child_ids if child_id not in kids.index]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Kids not found: {missing}")
+    if not child_ids:
+        raise HTTPException(status_code=422, detail="No kids to route")
+
+    subset = kids.loc[child_ids]
+    locations = list(zip(subset["Latitude"].tolist(), subset["Longitude"].tolist()))
+    key = (tuple(child_ids), request.improve_seconds, request.improve_iterations)
+    routes = state["routes"]
+    task = routes.get(key)
+    if task is None:
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(state["pool"], solve_cluster, locations,
+                                    request.improve_seconds, request.improve_iterations)
+        routes[key] = task
+        if len(routes) > ROUTE_CACHE_SIZE:
+            routes.popitem(last=False)
+    else:
+        routes.move_to_end(key)
+
+    try:
+        path, total_distance = await asyncio.shield(task)
+    except Exception:
+        routes.pop(key, None)
+        raise
+    return {
+        "child_ids": [child_ids[i] for i in path],
+        "total_distance_km": round(total_distance, 2),
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[locations[i][1], locations[i][0]] for i in path],
+        },
+    }
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "8000")))
@@ -0,0 +1,129 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from columnar import table_format, write_table
+
+# Kid counts generated by default
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Rows generated and written per batch
+CHUNK_SIZE = 100_000
+
+# Exponent of the Zipf-like weights over places: a few places get many kids, like big cities
+LOCATION_SKEW = 1.1
+
+# Largest share of all kids any single place may get (uncapped, the top place took about 16%)
+MAX_PLACE_SHARE = 0.005
+
+# Readable size label, e.g. 10k or 1M
+def size_label(n):
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n >= 1000 and n % 1000 == 0:
+        return f"{n // 1000}k"
+    return str(n)
+
+# Normalize weights so no entry exceeds cap, spreading the excess over the others in proportion
+def capped_weights(weights, cap):
+    weights = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    cap = max(cap, 1 / len(weights))
+    capped = np.zeros(len(weights), dtype=bool)
+    while True:
+        over = ~capped & (weights > cap)
+        if not over.any():
+            return weights
+        capped |= over
+        free = weights[~capped]
+        weights[capped] = cap
+        weights[~capped] = free * (1 - cap * capped.sum()) / free.sum()
+
+class KidGenerator:
+    """
+    Draws santa.csv-schema kids that look like a source file.
+
+    Places (Location, Latitude, Longitude, Country), names, gift preferences
+    and deeds are drawn from the values of the source file, places with
+    skewed weights (capped at MAX_PLACE_SHARE) so many kids share a place
+    without one town swallowing the list. Grades and listening scores
+    follow the source's mean and spread, and School_Grades and Bad_Deed are
+    missing as often as in the source.
+    """
+
+    def __init__(self, source='santa.csv'):
+        kids = pd.read_csv(source)
+        self.places = kids[['Location', 'Latitude', 'Longitude', 'Country']].drop_duplicates().reset_index(drop=True)
+        ranks = np.arange(1, len(self.places) + 1, dtype=np.float64)
+        weights = ranks ** -LOCATION_SKEW
+        self.place_weights = capped_weights(weights, MAX_PLACE_SHARE)
+        self.names = kids['Name'].to_numpy(dtype=object)
+        self.gifts = kids['Gift_Preference'].to_numpy(dtype=object)
+        self.good_deeds = kids['Good_Deed'].dropna().to_numpy(dtype=object)
+        self.bad_deeds = kids['Bad_Deed'].dropna().to_numpy(dtype=object)
+        self.ages = (int(kids['Age'].min()), int(kids['Age'].max()))
+        self.grades = kids['School_Grades'].agg(['mean', 'std', 'min', 'max']).to_dict()
+        self.listened = kids['Listened_To_Parents'].agg(['mean', 'std', 'min', 'max']).to_dict()
+        self.grades_missing = float(kids['School_Grades'].isna().mean())
+        self.bad_deed_missing = float(kids['Bad_Deed'].isna().mean())
+
+    def normal(self, rng, stats, n):
+        return np.clip(rng.normal(stats['mean'], stats['std'], n), stats['min'], stats['max'])
+
+    def chunk(self, rng, start, n):
+        """n kids with Child_IDs from start + 1."""
+        places = self.places.iloc[rng.choice(len(self.places), n, p=self.place_weights)].reset_index(drop=True)
+        grades = self.normal(rng, self.grades, n)
+        grades[rng.random(n) < self.grades_missing] = np.nan
+        bad_deeds = rng.choice(self.bad_deeds, n)
+        bad_deeds[rng.random(n) < self.bad_deed_missing] = None
+        return pd.DataFrame({
+            'Child_ID': np.arange(start + 1, start + n + 1),
+            'Name': rng.choice(self.names, n),
+            'Age': rng.integers(self.ages[0], self.ages[1] + 1, n),
+            'Location': places['Location'],
+            'Latitude': places['Latitude'],
+            'Longitude': places['Longitude'],
+            'Country': places['Country'],
+            'Gift_Preference': rng.choice(self.gifts, n),
+            'Listened_To_Parents': self.normal(rng, self.listened, n),
+            'School_Grades': grades,
+            'Good_Deed': rng.choice(self.good_deeds, n),
+            'Bad_Deed': bad_deeds,
+        })
+
+    def generate(self, n_kids, seed=42, chunk_size=CHUNK_SIZE):
+        """Yield the kids in chunks; the same seed always gives the same kids."""
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_kids, chunk_size):
+            yield self.chunk(rng, start, min(chunk_size, n_kids - start))
+
+# Write n_kids synthetic kids to output_file (CSV is written chunk by chunk)
+def write_synthetic(output_file, n_kids, seed=42, source='santa.csv', generator=None):
+    generator = generator or KidGenerator(source)
+    chunks = generator.generate(n_kids, seed)
+    if table_format(output_file) != 'csv':
+        write_table(pd.concat(chunks, ignore_index=True), output_file)
+        return output_file
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=i == 0)
+    return output_file
+
+def synthetic_path(n_kids, output_dir='synthetic', extension='.csv'):
+    return os.path.join(output_dir, f"santa_{size_label(n_kids)}{extension}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate santa.csv-style kid lists of any size.")
+    parser.add_argument('--kids', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--source', default='santa.csv', help="File whose places, names, gifts and deeds are reused.")
+    parser.add_argument('--output-dir', default='synthetic')
+    parser.add_argument('--format', choices=['.csv', '.cols', '.parquet', '.feather'], default='.csv')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    generator = KidGenerator(args.source)
+    for n_kids in args.kids:
+        path = write_synthetic(synthetic_path(n_kids, args.output_dir, args.format), n_kids, args.seed,
+                               generator=generator)
+        print(f"{n_kids} kids saved to {path}")
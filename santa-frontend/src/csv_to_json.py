@@ -1,30 +1,146 @@
+import argparse
 import csv
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 
-def csv_to_json(csv_file_path, json_file_path):
-    """Converts a CSV file to a JSON file."""
-    data = []
+# Columns that always stay text, even when they look like numbers
+TEXT_COLUMNS = {'Name', 'Location', 'Country', 'Gift_Preference', 'Horn Message', 'Good_Deed', 'Bad_Deed', 'Gift'}
 
-    with open(csv_file_path, mode='r', encoding='utf-8') as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-        for row in csv_reader:
-            # Convert numeric values from strings to appropriate types
-            for key in row:
-                try:
-                    if row[key] and key not in ['Name', 'Location', 'Country', 'Gift_Preference', 'Horn Message', 'Good_Deed', 'Bad_Deed', 'Gift']:
-                        row[key] = float(row[key]) if '.' in row[key] else int(row[key])
-                except ValueError:
-                    pass
+# Rows looked at to infer the column types
+SAMPLE_ROWS = 1000
 
-            data.append(row)
+# Rows encoded per write
+BATCH_ROWS = 1000
 
-    with open(json_file_path, mode='w', encoding='utf-8') as json_file:
-        json.dump(data, json_file, indent=4, ensure_ascii=False)
+def cast_number(value):
+    """Numbers with a '.' become floats, other numbers ints; anything else is kept as text."""
+    if not value:
+        return value
+    try:
+        return float(value) if '.' in value else int(value)
+    except ValueError:
+        return value
 
-# Convert santa2.csv
-csv_to_json('santa2.csv', 'santa2.json')
+def cast_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return cast_number(value)
 
-# Convert gifts.csv
-csv_to_json('gifts.csv', 'gifts.json')
+def cast_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
 
-print("CSV files have been successfully converted to JSON!")
+def cast_text(value):
+    return value
+
+CASTERS = {'str': cast_text, 'int': cast_int, 'float': cast_float, 'number': cast_number}
+
+def infer_schema(header, rows):
+    """
+    Column types from sample rows: 'str' for TEXT_COLUMNS, 'int' when every
+    sampled value is an integer, otherwise 'number' (ints and floats told
+    apart per value by the '.', non-numeric values kept as text).
+    """
+    schema = {}
+    for i, name in enumerate(header):
+        values = [row[i] for row in rows if i < len(row) and row[i]]
+        if name in TEXT_COLUMNS:
+            schema[name] = 'str'
+        elif all('.' not in value and cast_number(value) is not value for value in values):
+            schema[name] = 'int'
+        else:
+            schema[name] = 'number'
+    return schema
+
+def convert_batch(rows, header, casters):
+    """
+    One dict per CSV row, like csv.DictReader, with the values cast.
+
+    The batch is cast column by column, so text columns cost nothing.
+    """
+    width = len(header)
+    rows = [row for row in rows if row]
+    regular = all(len(row) == width for row in rows)
+    padded = rows if regular else [row[:width] + [None] * (width - len(row)) for row in rows]
+    columns = [column if cast is cast_text else list(map(cast, column))
+               for cast, column in zip(casters, zip(*padded))]
+    records = [dict(zip(header, values)) for values in zip(*columns)] if columns else [{} for _ in rows]
+    if not regular:
+        for record, row in zip(records, rows):
+            if len(row) > width:
+                record[None] = row[width:]
+    return records
+
+def csv_to_json(csv_file_path, json_file_path, schema=None, ndjson=False):
+    """
+    Converts a CSV file to a JSON file.
+
+    Rows are streamed: the column types come from `schema` (column -> 'str',
+    'int', 'float' or 'number') or are inferred from the first SAMPLE_ROWS
+    rows, and rows are written as a compact JSON array (or one object per
+    line with ndjson=True) in batches, so memory stays constant.
+    """
+    with open(csv_file_path, mode='r', encoding='utf-8', newline='') as csv_file, \
+            open(json_file_path, mode='w', encoding='utf-8') as json_file:
+        csv_reader = csv.reader(csv_file)
+        header = next(csv_reader, [])
+        sample = list(islice(csv_reader, SAMPLE_ROWS))
+        inferred = infer_schema(header, sample)
+        if schema:
+            inferred.update(schema)
+        casters = [CASTERS[inferred[name]] for name in header]
+
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        rows = chain(sample, csv_reader)
+        count = 0
+        if not ndjson:
+            json_file.write('[')
+        while True:
+            batch = convert_batch(islice(rows, BATCH_ROWS), header, casters)
+            if not batch:
+                break
+            if ndjson:
+                json_file.write(''.join(encode(record) + '\n' for record in batch))
+            else:
+                # Encoding the batch as one list is a single call into the C encoder
+                json_file.write((',' if count else '') + encode(batch)[1:-1])
+            count += len(batch)
+        if not ndjson:
+            json_file.write(']')
+    return count
+
+def output_path(csv_file_path, ndjson=False):
+    return os.path.splitext(csv_file_path)[0] + ('.ndjson' if ndjson else '.json')
+
+def convert_files(csv_file_paths, schema=None, ndjson=False, workers=None):
+    """Convert several CSV files, each in its own process."""
+    json_file_paths = [output_path(path, ndjson) for path in csv_file_paths]
+    if len(csv_file_paths) == 1 or workers == 1:
+        counts = [csv_to_json(source, target, schema, ndjson) for source, target in zip(csv_file_paths, json_file_paths)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(csv_to_json, csv_file_paths, json_file_paths,
+                                   [schema] * len(csv_file_paths), [ndjson] * len(csv_file_paths)))
+    return dict(zip(json_file_paths, counts))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert CSV files to JSON for the frontend.")
+    parser.add_argument('files', nargs='*', default=['santa2.csv', 'gifts.csv'])
+    parser.add_argument('--ndjson', action='store_true', help="Write one JSON object per line (.ndjson).")
+    parser.add_argument('--schema', help="JSON file mapping column names to str, int, float or number.")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    schema = None
+    if args.schema:
+        with open(args.schema, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+
+    for json_file_path, count in convert_files(args.files, schema, args.ndjson, args.workers).items():
+        print(f"{count} rows saved to {json_file_path}")
+    print("CSV files have been successfully converted to JSON!")